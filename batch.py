@@ -0,0 +1,130 @@
+import os
+
+# Run without a window or sound card. Must be set before pygame is imported.
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import json
+import math
+import random
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+import main as game
+
+# Runs many headless sessions in parallel, each on its own process and seed,
+# and summarises how far they got. Used for balancing difficulty and for
+# soak runs without anyone at the keyboard.
+
+def bot_inputs(sim, rng, tick):
+    # Aims at the nearest living alien (or the boss), walks towards falling
+    # power-ups and otherwise wanders, jumping now and then
+    player = sim.player
+    targets = [alien for alien in sim.aliens if not alien.destroyed]
+    if sim.boss:
+        targets.append(sim.boss)
+    if targets:
+        target = min(targets, key=lambda alien: abs(alien.rect.centerx - player.rect.centerx))
+        aim = target.rect.center
+    else:
+        aim = (game.WINDOW_WIDTH, player.rect.centery)
+
+    power_up = next(iter(sim.power_ups), None)
+    if power_up:
+        left = power_up.rect.centerx < player.rect.centerx - 5
+        right = power_up.rect.centerx > player.rect.centerx + 5
+    else:
+        left = rng.random() < 0.2
+        right = rng.random() < 0.2
+    return game.Inputs(left, right, jump=tick % 40 == 0, shoot=True, aim=aim)
+
+def random_inputs(sim, rng, tick):
+    # Mashes buttons and aims anywhere
+    return game.Inputs(rng.random() < 0.3, rng.random() < 0.3, rng.random() < 0.05, rng.random() < 0.5,
+                       aim=(rng.randrange(game.WINDOW_WIDTH), rng.randrange(game.WINDOW_HEIGHT)))
+
+POLICIES = {
+    'bot': bot_inputs,
+    'random': random_inputs,
+}
+
+def run_session(seed, policy, max_ticks):
+    # One game from the start until game over or max_ticks
+    sim = game.Simulation(seed)
+    rng = random.Random(seed)
+    choose_inputs = POLICIES[policy]
+    start = time.perf_counter()
+    while not sim.game_over and sim.tick < max_ticks:
+        sim.step(choose_inputs(sim, rng, sim.tick))
+    elapsed = time.perf_counter() - start
+
+    stats = sim.stats
+    return OrderedDict([
+        ('seed', seed),
+        ('ticks', sim.tick),
+        ('game_over', sim.game_over),
+        ('level', sim.player.level),
+        ('score', sim.player.score),
+        ('kills', stats.kills),
+        ('boss_kills', stats.boss_kills),
+        ('damage_taken', stats.damage_taken),
+        # Seconds of game time, or NaN when nothing was killed
+        ('time_to_kill', numpy.mean(stats.kill_ticks) / game.TICKS_PER_SECOND if stats.kill_ticks else math.nan),
+        ('boss_time_to_kill',
+         numpy.mean(stats.boss_kill_ticks) / game.TICKS_PER_SECOND if stats.boss_kill_ticks else math.nan),
+        ('ticks_per_sec', sim.tick / elapsed),
+    ])
+
+SUMMARY_COLUMNS = ['level', 'score', 'kills', 'boss_kills', 'damage_taken', 'time_to_kill',
+                   'boss_time_to_kill', 'ticks', 'ticks_per_sec']
+
+def summarise(results):
+    # Mean, median and range of each column across sessions, skipping NaNs
+    print(f'{"":<18}{"mean":>10}{"p50":>10}{"min":>10}{"max":>10}')
+    for column in SUMMARY_COLUMNS:
+        values = numpy.array([result[column] for result in results], dtype=float)
+        values = values[~numpy.isnan(values)]
+        if len(values) == 0:
+            print(f'{column:<18}{"-":>10}{"-":>10}{"-":>10}{"-":>10}')
+            continue
+        print(f'{column:<18}{values.mean():>10.2f}{numpy.median(values):>10.2f}'
+              f'{values.min():>10.2f}{values.max():>10.2f}')
+    survived = sum(1 for result in results if not result['game_over'])
+    print(f'{survived} of {len(results)} sessions were still alive at the tick limit')
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel headless sessions of War of the Worlds Adventure!")
+    parser.add_argument('--sessions', type=int, default=32, help='number of sessions to run (default 32)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('--seed', type=game.seed_value, default=0, help='seed of the first session, the rest count up from it')
+    parser.add_argument('--policy', choices=list(POLICIES), default='bot', help='how inputs are chosen')
+    parser.add_argument('--max-ticks', type=int, default=10 * 60 * game.TICKS_PER_SECOND,
+                        help='stop a session after this many ticks (default 10 minutes of game time)')
+    parser.add_argument('--json', metavar='PATH', help='also write every session\'s results to PATH')
+    args = parser.parse_args()
+    if args.seed + args.sessions > game.SEED_LIMIT:
+        parser.error(f'the last session\'s seed would be over {game.SEED_LIMIT - 1}')
+
+    seeds = range(args.seed, args.seed + args.sessions)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(run_session, seeds, [args.policy] * args.sessions,
+                                [args.max_ticks] * args.sessions))
+    elapsed = time.perf_counter() - start
+
+    total_ticks = sum(result['ticks'] for result in results)
+    print(f'{args.sessions} sessions, {total_ticks} ticks in {elapsed:.1f}s '
+          f'({total_ticks / elapsed:.0f} ticks/sec across {args.workers} workers)')
+    summarise(results)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import os
+
+# Run without a window or sound card. Must be set before pygame is imported.
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+import pygame
+
+import main as game
+
+# Stress scenarios for the simulation and renderer. Each one sets up a fresh
+# Simulation and returns a function that is called before every tick to keep
+# the pressure on, returning that tick's inputs. Everything is built from the
+# game's own classes so a slowdown in their update() shows up here.
+
+def keep_alive(sim):
+    # Nobody dies and no level ever completes, so every tick does full work
+    sim.player.health = 100
+    sim.player.aliens_needed = 10**9
+
+def tripods(sim, count=60):
+    # A screen full of walking tripods of every type
+    rng = sim.random.get("bench")
+    types = ["basic", "fast", "tank", "shooter"]
+
+    def tick(n):
+        keep_alive(sim)
+        while len(sim.aliens) < count:
+            alien = game.Alien(sim, 7, types[len(sim.aliens) % len(types)])
+            alien.rect.x = rng.randrange(0, game.WINDOW_WIDTH)
+            sim.lifecycle.spawn(alien, sim.all_sprites, sim.aliens, sim.actors)
+        return game.NO_INPUT
+    return tick
+
+def assault_rifle(sim):
+    # Five-laser spread fired every tick with no fire delay
+    player = sim.player
+    player.equip("assault_rifle")
+    player.shoot_delay = 0
+
+    def tick(n):
+        keep_alive(sim)
+        player.ammo["assault_rifle"] = 10**9
+        return game.Inputs(shoot=True, aim=(game.WINDOW_WIDTH, n * 7 % game.WINDOW_HEIGHT))
+    return tick
+
+def explosions(sim, per_tick=5, debris=20):
+    # Several alien explosions every tick, enough to fill the particle buffer
+    rng = sim.random.get("bench")
+    colors = [(100, 100, 100), (0, 255, 0), (255, 0, 0), (0, 255, 255)]
+
+    def tick(n):
+        keep_alive(sim)
+        for i in range(per_tick):
+            rect = pygame.Rect(rng.randrange(0, game.WINDOW_WIDTH - 60), rng.randrange(0, 400), 60, 80)
+            sim.particles.emit(rect, colors[i % len(colors)], debris)
+        return game.NO_INPUT
+    return tick
+
+def buildings_on_fire(sim):
+    # Every building burning at once
+    def tick(n):
+        keep_alive(sim)
+        for building in sim.buildings:
+            building.on_fire = True
+        return game.NO_INPUT
+    return tick
+
+def boss_fight(sim):
+    # The boss firing energy balls much faster than usual
+    boss = game.BossAlien(sim, 7)
+    boss.health = 10**9
+    boss.attack_delay = 3
+    sim.boss = sim.lifecycle.spawn(boss, sim.all_sprites, sim.actors)
+
+    def tick(n):
+        keep_alive(sim)
+        return game.NO_INPUT
+    return tick
+
+def ufos(sim, count=20):
+    # A fleet of UFOs crossing the screen, each firing at the nearest building
+    # several times a second
+    rng = sim.random.get("bench")
+
+    def tick(n):
+        keep_alive(sim)
+        for building in sim.buildings:
+            building.health = 100  # Keep every target standing
+        while len(sim.aliens) < count:
+            ufo = game.UFO(sim, 7)
+            ufo.rect.x = rng.randrange(0, game.WINDOW_WIDTH)
+            ufo.attack_delay = 10
+            sim.lifecycle.spawn(ufo, sim.all_sprites, sim.aliens, sim.actors)
+        return game.NO_INPUT
+    return tick
+
+SCENARIOS = OrderedDict([
+    ('tripods', tripods),
+    ('assault_rifle', assault_rifle),
+    ('explosions', explosions),
+    ('buildings_on_fire', buildings_on_fire),
+    ('boss_fight', boss_fight),
+    ('ufos', ufos),
+])
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def count_allocations(sim, renderer, tick, first, ticks):
+    # CPython has no allocation counter and tracemalloc only reports live
+    # blocks, so traces are cleared before every tick and whatever is still
+    # traced after it was allocated during that tick and outlived it, such
+    # as a sprite or a surface built to replace last frame's. Blocks
+    # allocated and freed inside the tick only show up in the traced peak.
+    tracemalloc.start()
+    blocks = size = peak = 0
+    for n in range(first, first + ticks):
+        tracemalloc.clear_traces()
+        tracemalloc.reset_peak()
+        sim.step(tick(n))
+        renderer.draw(sim)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        traces = tracemalloc.take_snapshot().traces
+        blocks += len(traces)
+        size += sum(trace.size for trace in traces)
+    tracemalloc.stop()
+    return OrderedDict([
+        ('allocations_per_tick', blocks / ticks),
+        ('allocated_kb_per_tick', size / ticks / 1024),
+        ('traced_peak_kb', peak / 1024),
+    ])
+
+def run_scenario(name, ticks, warmup, allocation_ticks, seed):
+    # Runs in a process of its own (see main), so the object pools, caches
+    # and peak RSS all start fresh whatever ran before
+    screen = pygame.display.set_mode((game.WINDOW_WIDTH, game.WINDOW_HEIGHT))
+    sim = game.Simulation(seed)
+    renderer = game.Renderer(screen)
+    tick = SCENARIOS[name](sim)
+    for n in range(warmup):
+        sim.step(tick(n))
+        renderer.draw(sim)
+
+    pools = OrderedDict([('laser_pool', game.laser_pool), ('energy_ball_pool', game.energy_ball_pool)])
+    pools_before = {name: pool.stats() for name, pool in pools.items()}
+    frame_times = []
+    start = time.perf_counter()
+    for n in range(warmup, warmup + ticks):
+        frame_start = time.perf_counter()
+        sim.step(tick(n))
+        renderer.draw(sim)
+        frame_times.append((time.perf_counter() - frame_start) * 1000)
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = numpy.percentile(frame_times, (50, 95, 99))
+    result = OrderedDict([
+        ('ticks_per_sec', ticks / elapsed),
+        ('frame_ms_p50', p50),
+        ('frame_ms_p95', p95),
+        ('frame_ms_p99', p99),
+        ('sprites', len(sim.all_sprites)),
+        ('particles', len(sim.particles)),
+    ])
+    # Pool reuse over the measured ticks only
+    for name, pool in pools.items():
+        stats = pool.stats()
+        for stat in ('hits', 'misses'):
+            result[f'{name}_{stat}'] = stats[stat] - pools_before[name][stat]
+
+    # Allocations are counted afterwards, as tracing slows every tick down
+    result.update(count_allocations(sim, renderer, tick, warmup + ticks, allocation_ticks))
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+def compare(results, baseline, tolerance):
+    # Print the change against the baseline and return the scenarios that got
+    # slower by more than tolerance (a fraction) in throughput or p95 frame time
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f'{name:<20} no baseline')
+            continue
+        speed = result['ticks_per_sec'] / before['ticks_per_sec'] - 1
+        p95 = result['frame_ms_p95'] / before['frame_ms_p95'] - 1
+        regressed = speed < -tolerance or p95 > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f'{name:<20} ticks/sec {speed:+7.1%}  p95 {p95:+7.1%}{"  REGRESSION" if regressed else ""}')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless stress benchmarks for War of the Worlds Adventure!")
+    parser.add_argument('scenarios', nargs='*', metavar='SCENARIO',
+                        help=f'scenarios to run, from {", ".join(SCENARIOS)} (default: all)')
+    parser.add_argument('--ticks', type=int, default=600, help='measured ticks per scenario')
+    parser.add_argument('--warmup', type=int, default=60, help='unmeasured ticks before measuring')
+    parser.add_argument('--seed', type=game.seed_value, default=1, help='simulation seed')
+    parser.add_argument('--allocation-ticks', type=int, default=120,
+                        help='untimed ticks traced after the measured ones to count allocations')
+    parser.add_argument('--baseline', metavar='PATH', help='compare against results saved in PATH')
+    parser.add_argument('--save-baseline', metavar='PATH', help='save these results to PATH')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='allowed slowdown against the baseline before failing (default 0.10)')
+    args = parser.parse_args()
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f'unknown scenario {name!r}')
+    if args.ticks < 1 or args.allocation_ticks < 1:
+        parser.error('--ticks and --allocation-ticks must be at least 1')
+
+    results = OrderedDict()
+    print(f'{"scenario":<20}{"ticks/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"rss MB":>9}'
+          f'{"allocs/t":>10}{"pool hits":>11}{"misses":>8}')
+    for name in args.scenarios or SCENARIOS:
+        # A fresh interpreter per scenario, so none inherits another's
+        # warmed pools or memory high-water mark
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            result = pool.submit(run_scenario, name, args.ticks, args.warmup, args.allocation_ticks,
+                                 args.seed).result()
+        results[name] = result
+        print(f'{name:<20}{result["ticks_per_sec"]:>9.0f}{result["frame_ms_p50"]:>9.2f}'
+              f'{result["frame_ms_p95"]:>9.2f}{result["frame_ms_p99"]:>9.2f}'
+              f'{result["peak_rss_mb"]:>9.1f}{result["allocations_per_tick"]:>10.1f}'
+              f'{result["laser_pool_hits"] + result["energy_ball_pool_hits"]:>11}'
+              f'{result["laser_pool_misses"] + result["energy_ball_pool_misses"]:>8}')
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        print()
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,35 @@ import pygame
 import random
 import sys
 import os
+import glob
+import hashlib
+import inspect
+import zlib
 import wave
 import struct
 import math
+import time
+import argparse
+import csv
+import json
 import numpy
+from collections import OrderedDict, deque, namedtuple
 
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init()
+import synth
+
+# Only fonts are needed to build the simulation and its images. main() starts
+# the rest of pygame, so the simulation can be imported and run without a
+# display or audio device.
+pygame.font.init()
 
 # Game window settings
 WINDOW_WIDTH = 800
 WINDOW_HEIGHT = 600
-screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-pygame.display.set_caption("War of the Worlds Adventure!")
+
+# The simulation advances in fixed 60 Hz ticks regardless of the frame rate
+TICKS_PER_SECOND = 60
+STEP_MS = 1000 / TICKS_PER_SECOND
+MAX_STEPS_PER_FRAME = 5  # Drop time instead of spiralling when frames run long
 
 # Colors (for shapes and UI)
 WHITE = (255, 255, 255)
@@ -26,185 +41,234 @@ BLUE = (0, 0, 255)
 SKY_BLUE = (135, 206, 235)
 YELLOW = (255, 255, 0)
 
-# Create assets directory if it doesn't exist
-if not os.path.exists('assets'):
-    os.makedirs('assets')
-
 # Generate simple sound effects
+SOUND_SEED = 0
+
+def make_sound(signal):
+    return pygame.sndarray.make_sound(synth.to_stereo_pcm(signal))
+
+def generate_tone(duration, frequency):
+    t = synth.timeline(duration)
+    return synth.sine(frequency, t)
+
 def generate_jump_sound():
-    sample_rate = 44100
-    duration = 0.1
-    frequency = 440
-    num_samples = int(sample_rate * duration)
-    samples = []
-    
-    for i in range(num_samples):
-        t = i / sample_rate
-        sample = int(32767 * math.sin(2 * math.pi * frequency * t))
-        samples.append([sample, sample])  # Same sample for both channels
-    
-    return pygame.sndarray.make_sound(numpy.array(samples, dtype=numpy.int16))
+    return make_sound(generate_tone(0.1, 440))
 
 def generate_power_up_sound():
-    sample_rate = 44100
-    duration = 0.2
-    frequency = 880
-    num_samples = int(sample_rate * duration)
-    samples = []
-    
-    for i in range(num_samples):
-        t = i / sample_rate
-        sample = int(32767 * math.sin(2 * math.pi * frequency * t))
-        samples.append([sample, sample])  # Same sample for both channels
-    
-    return pygame.sndarray.make_sound(numpy.array(samples, dtype=numpy.int16))
+    return make_sound(generate_tone(0.2, 880))
 
 def generate_hit_sound():
-    sample_rate = 44100
-    duration = 0.1
-    frequency = 220
-    num_samples = int(sample_rate * duration)
-    samples = []
-    
-    for i in range(num_samples):
-        t = i / sample_rate
-        sample = int(32767 * math.sin(2 * math.pi * frequency * t))
-        samples.append([sample, sample])  # Same sample for both channels
-    
-    return pygame.sndarray.make_sound(numpy.array(samples, dtype=numpy.int16))
+    return make_sound(generate_tone(0.1, 220))
 
 def generate_laser_sound():
-    sample_rate = 44100
-    duration = 0.05
-    frequency = 1200
-    num_samples = int(sample_rate * duration)
-    samples = []
-    
-    for i in range(num_samples):
-        t = i / sample_rate
-        sample = int(32767 * math.sin(2 * math.pi * frequency * t))
-        samples.append([sample, sample])  # Same sample for both channels
-    
-    return pygame.sndarray.make_sound(numpy.array(samples, dtype=numpy.int16))
+    return make_sound(generate_tone(0.05, 1200))
 
 def generate_heat_ray_sound():
-    sample_rate = 44100
     duration = 1.0
-    num_samples = int(sample_rate * duration)
-    samples = []
+    t = synth.timeline(duration)
+    rng = numpy.random.default_rng(SOUND_SEED)  # Same crackle on every run
     
-    for i in range(num_samples):
-        t = i / sample_rate
-        
-        # Create fire-like sound with multiple frequencies
-        base_freq = 2000 * (1 - t/duration)  # Descending base frequency
-        crackle_freq = random.randint(1000, 4000)  # Random crackle frequencies
-        
-        # Main fire sound
-        fire = math.sin(2 * math.pi * base_freq * t)
-        
-        # Add crackling effect
-        crackle = random.uniform(-0.3, 0.3) * math.sin(2 * math.pi * crackle_freq * t)
-        
-        # Add low rumble
-        rumble = 0.2 * math.sin(2 * math.pi * 100 * t)
-        
-        # Combine all elements
-        combined = fire + crackle + rumble
-        
-        # Add amplitude modulation for "whoosh" effect
-        mod = math.sin(2 * math.pi * 3 * t)
-        
-        # Final sample with modulation
-        sample = int(32767 * combined * (1 + 0.3 * mod))
-        samples.append([sample, sample])
+    # Create fire-like sound with multiple frequencies
+    base_freq = synth.ramp(2000, 0, t, duration)  # Descending base frequency
+    crackle_freq = synth.random_frequencies(rng, 1000, 4000, t)  # Random crackle frequencies
     
-    return pygame.sndarray.make_sound(numpy.array(samples, dtype=numpy.int16))
+    # Main fire sound
+    fire = synth.sine(base_freq, t)
+    
+    # Add crackling effect
+    crackle = synth.noise(rng, -0.3, 0.3, t) * synth.sine(crackle_freq, t)
+    
+    # Add low rumble
+    rumble = 0.2 * synth.sine(100, t)
+    
+    # Combine all elements and add amplitude modulation for "whoosh" effect
+    return make_sound(synth.amplitude_modulate(fire + crackle + rumble, 0.3, 3, t))
 
 def generate_ufo_sound():
-    sample_rate = 44100
-    duration = 0.3
-    num_samples = int(sample_rate * duration)
-    samples = []
+    t = synth.timeline(0.3)
     
-    for i in range(num_samples):
-        t = i / sample_rate
-        
-        # Create UFO-like sound with multiple frequencies
-        base_freq = 800 + math.sin(t * 10) * 200  # Oscillating base frequency
-        high_freq = 2000 + math.sin(t * 15) * 500  # Oscillating high frequency
-        
-        # Main UFO sound
-        ufo = math.sin(2 * math.pi * base_freq * t)
-        
-        # Add high-pitched whine
-        whine = 0.5 * math.sin(2 * math.pi * high_freq * t)
-        
-        # Add amplitude modulation for "pulsing" effect
-        mod = math.sin(2 * math.pi * 8 * t)
-        
-        # Final sample with modulation
-        sample = int(32767 * (ufo + whine) * (1 + 0.3 * mod))
-        samples.append([sample, sample])
+    # Create UFO-like sound with multiple frequencies
+    base_freq = synth.wobble(800, 200, 10, t)  # Oscillating base frequency
+    high_freq = synth.wobble(2000, 500, 15, t)  # Oscillating high frequency
+    
+    # Main UFO sound
+    ufo = synth.sine(base_freq, t)
+    
+    # Add high-pitched whine
+    whine = 0.5 * synth.sine(high_freq, t)
     
-    return pygame.sndarray.make_sound(numpy.array(samples, dtype=numpy.int16))
+    # Add amplitude modulation for "pulsing" effect
+    return make_sound(synth.amplitude_modulate(ufo + whine, 0.3, 8, t))
 
 def generate_boss_sound():
-    sample_rate = 44100
-    duration = 0.5
-    num_samples = int(sample_rate * duration)
-    samples = []
+    t = synth.timeline(0.5)
     
-    for i in range(num_samples):
-        t = i / sample_rate
-        
-        # Create boss-like sound with multiple frequencies
-        base_freq = 400 + math.sin(t * 5) * 100  # Oscillating base frequency
-        mid_freq = 1000 + math.sin(t * 8) * 300  # Oscillating mid frequency
-        high_freq = 2500 + math.sin(t * 12) * 600  # Oscillating high frequency
+    # Create boss-like sound with multiple frequencies
+    base_freq = synth.wobble(400, 100, 5, t)  # Oscillating base frequency
+    mid_freq = synth.wobble(1000, 300, 8, t)  # Oscillating mid frequency
+    high_freq = synth.wobble(2500, 600, 12, t)  # Oscillating high frequency
+    
+    # Main boss sound
+    boss = synth.sine(base_freq, t)
+    
+    # Add mid and high frequencies
+    mid = 0.5 * synth.sine(mid_freq, t)
+    high = 0.3 * synth.sine(high_freq, t)
+    
+    # Add amplitude modulation for "threatening" effect
+    return make_sound(synth.amplitude_modulate(boss + mid + high, 0.4, 6, t))
+
+# Generated sounds are cached in assets/ as <name>-<key>.wav. The key hashes the
+# generator and the shared synthesis code, so editing either regenerates the file.
+SOUND_CACHE_DIR = 'assets'
+
+def source_of(obj):
+    try:
+        return inspect.getsource(obj)
+    except (OSError, TypeError):  # No source available, e.g. in a frozen build
+        return repr(obj.__code__.co_code if hasattr(obj, '__code__') else obj)
+
+def sound_cache_key(name, generator):
+    digest = hashlib.sha1()
+    parts = [name, repr(pygame.mixer.get_init()), repr(SOUND_SEED), source_of(generator),
+             source_of(make_sound), source_of(generate_tone), source_of(synth)]
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+def save_sound(sound, path):
+    frequency, size, channels = pygame.mixer.get_init()
+    temp_path = path + '.tmp'
+    with wave.open(temp_path, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(abs(size) // 8)
+        wav_file.setframerate(frequency)
+        wav_file.writeframes(sound.get_raw())
+    os.replace(temp_path, path)  # Never leave a half-written cache entry behind
+
+def load_sound(name, generator):
+    # A hand-made assets/<name>.wav always wins over generated audio
+    override_path = os.path.join(SOUND_CACHE_DIR, name + '.wav')
+    if os.path.exists(override_path):
+        return pygame.mixer.Sound(override_path)
+    
+    cache_path = os.path.join(SOUND_CACHE_DIR, f'{name}-{sound_cache_key(name, generator)}.wav')
+    
+    # Remove entries written by older versions of this generator
+    for stale_path in glob.glob(os.path.join(SOUND_CACHE_DIR, name + '-*.wav')):
+        if stale_path != cache_path:
+            try:
+                os.remove(stale_path)
+            except OSError:
+                pass
+    
+    if os.path.exists(cache_path):
+        try:
+            return pygame.mixer.Sound(cache_path)
+        except pygame.error:
+            pass  # Corrupt entry, regenerate it below
+    
+    sound = generator()
+    try:
+        save_sound(sound, cache_path)
+    except OSError:
+        pass  # Read-only install, keep the generated sound in memory only
+    return sound
+
+# Sound effects and their volumes, keyed by the names the simulation plays
+SOUND_GENERATORS = {
+    'jump': (generate_jump_sound, 0.3),
+    'power_up': (generate_power_up_sound, 0.4),
+    'hit': (generate_hit_sound, 0.3),
+    'laser': (generate_laser_sound, 0.2),
+    'heat_ray': (generate_heat_ray_sound, 0.5),
+    'ufo': (generate_ufo_sound, 0.4),
+    'boss': (generate_boss_sound, 0.5),
+}
+
+def load_sounds():
+    # Load or generate sound effects
+    os.makedirs(SOUND_CACHE_DIR, exist_ok=True)
+    sounds = {}
+    for name, (generator, volume) in SOUND_GENERATORS.items():
+        sounds[name] = load_sound(name, generator)
+        sounds[name].set_volume(volume)
+    return sounds
+
+# Mixing rules per effect: priority (higher keeps its voice), how many copies
+# may play at once, and the window in ms within which repeats are merged into
+# the copy already playing
+SoundRule = namedtuple('SoundRule', ['priority', 'max_instances', 'cooldown_ms'])
+
+SOUND_RULES = {
+    'power_up': SoundRule(3, 2, 50),
+    'hit': SoundRule(3, 2, 50),
+    'boss': SoundRule(2, 2, 100),
+    'jump': SoundRule(2, 1, 50),
+    'heat_ray': SoundRule(1, 1, 200),
+    'ufo': SoundRule(1, 2, 100),
+    'laser': SoundRule(0, 3, 60),
+}
+
+# Plays effects on channels it manages itself. The first reserved channels
+# are kept for effects of reserved_priority or higher. When every usable
+# channel is busy, the newest cue steals the oldest voice with a lower
+# priority, or is dropped if there is none.
+class SoundBus:
+    def __init__(self, sounds, rules=SOUND_RULES, channels=16, reserved=2, reserved_priority=3):
+        self.sounds = sounds
+        self.rules = rules
+        self.reserved = reserved
+        self.reserved_priority = reserved_priority
+        pygame.mixer.set_num_channels(channels)
+        pygame.mixer.set_reserved(reserved)  # Keep plain Sound.play() off the reserved channels
+        self.channels = [pygame.mixer.Channel(i) for i in range(channels)]
+        self.voices = {}  # Channel index -> (name, priority, start time)
+        self.last_played = {}  # Name -> start time of its latest copy
+        self.played = 0
+        self.merged = 0  # Repeats inside the cooldown
+        self.limited = 0  # Over the effect's max_instances
+        self.dropped = 0  # No free or stealable channel
+        self.stolen = 0  # Voices cut off for a higher priority effect
+
+    def play(self, name, now):
+        rule = self.rules[name]
         
-        # Main boss sound
-        boss = math.sin(2 * math.pi * base_freq * t)
+        # Merge repeats, e.g. the five lasers of one assault rifle shot
+        last = self.last_played.get(name)
+        if last is not None and now - last < rule.cooldown_ms:
+            self.merged += 1
+            return
         
-        # Add mid and high frequencies
-        mid = 0.5 * math.sin(2 * math.pi * mid_freq * t)
-        high = 0.3 * math.sin(2 * math.pi * high_freq * t)
+        # Forget voices that have finished
+        for index in [index for index in self.voices if not self.channels[index].get_busy()]:
+            del self.voices[index]
         
-        # Add amplitude modulation for "threatening" effect
-        mod = math.sin(2 * math.pi * 6 * t)
+        if sum(1 for voice in self.voices.values() if voice[0] == name) >= rule.max_instances:
+            self.limited += 1
+            return
         
-        # Final sample with modulation
-        sample = int(32767 * (boss + mid + high) * (1 + 0.4 * mod))
-        samples.append([sample, sample])
-    
-    return pygame.sndarray.make_sound(numpy.array(samples, dtype=numpy.int16))
-
-# Load or generate sound effects
-try:
-    jump_sound = pygame.mixer.Sound('assets/jump.wav')
-    power_up_sound = pygame.mixer.Sound('assets/power_up.wav')
-    hit_sound = pygame.mixer.Sound('assets/hit.wav')
-    laser_sound = pygame.mixer.Sound('assets/laser.wav')
-    heat_ray_sound = pygame.mixer.Sound('assets/heat_ray.wav')
-    ufo_sound = pygame.mixer.Sound('assets/ufo.wav')
-    boss_sound = pygame.mixer.Sound('assets/boss.wav')
-except:
-    jump_sound = generate_jump_sound()
-    power_up_sound = generate_power_up_sound()
-    hit_sound = generate_hit_sound()
-    laser_sound = generate_laser_sound()
-    heat_ray_sound = generate_heat_ray_sound()
-    ufo_sound = generate_ufo_sound()
-    boss_sound = generate_boss_sound()
-
-# Set volume for sound effects
-jump_sound.set_volume(0.3)
-power_up_sound.set_volume(0.4)
-hit_sound.set_volume(0.3)
-laser_sound.set_volume(0.2)
-heat_ray_sound.set_volume(0.5)
-ufo_sound.set_volume(0.4)
-boss_sound.set_volume(0.5)
+        first = 0 if rule.priority >= self.reserved_priority else self.reserved
+        usable = range(first, len(self.channels))
+        index = next((index for index in usable if index not in self.voices), None)
+        if index is None:
+            # Steal the oldest of the lowest priority voices below this one
+            victims = [(voice[1], voice[2], index) for index, voice in self.voices.items()
+                       if index >= first and voice[1] < rule.priority]
+            if not victims:
+                self.dropped += 1
+                return
+            index = min(victims)[2]
+            self.stolen += 1
+        
+        self.channels[index].play(self.sounds[name])
+        self.voices[index] = (name, rule.priority, now)
+        self.last_played[name] = now
+        self.played += 1
+
+    def stats(self):
+        return {"played": self.played, "merged": self.merged, "limited": self.limited,
+                "dropped": self.dropped, "stolen": self.stolen}
 
 # Create simple graphics
 def create_tripod(leg_angles=None):
@@ -296,54 +360,341 @@ def create_boss_tripod(leg_angles):
     pygame.draw.circle(surface, (255, 255, 0), (60, 60), 20)
     return surface
 
-class Laser(pygame.sprite.Sprite):
-    def __init__(self, x, y, shooter_type="player"):
-        super().__init__()
-        self.shooter_type = shooter_type
-        self.image = pygame.Surface((10, 5))
-        
-        # Set color and damage based on shooter type
-        if shooter_type == "player":
-            self.image.fill(YELLOW)
-            self.damage = 1
-        elif shooter_type == "boss":
-            self.image.fill((255, 0, 255))  # Purple for boss
-            self.damage = 15
-        elif shooter_type == "shooter":
-            self.image.fill((255, 165, 0))  # Orange for shooter aliens
-            self.damage = 4
-        elif shooter_type == "ufo":
-            self.image.fill((0, 255, 255))  # Cyan for UFOs
-            self.damage = 3
-        elif shooter_type == "rpg":
-            self.image.fill((255, 165, 0))  # Orange for RPG
-            self.damage = 20
-        elif shooter_type == "assault_rifle":
-            self.image.fill((128, 128, 128))  # Gray for assault rifle
-            self.damage = 3
-        elif shooter_type == "pistol":
-            self.image.fill((192, 192, 192))  # Silver for pistol
-            self.damage = 8
-        elif shooter_type == "sniper":
-            self.image.fill((0, 255, 255))  # Cyan for sniper
-            self.damage = 25
-        elif shooter_type == "finger_gun":
-            self.image.fill((255, 192, 203))  # Pink for finger gun
-            self.damage = 50
+# Leg animation limits shared by Alien and BossAlien
+LEG_ANGLE_LIMIT = 15
+LEG_SPEED = 2
+
+def step_legs(leg_angles, leg_speeds, leg_directions):
+    for i in range(3):
+        # Update leg angle
+        leg_angles[i] += leg_speeds[i] * leg_directions[i]
+        
+        # Change direction if leg reaches limits
+        if leg_angles[i] > LEG_ANGLE_LIMIT:  # Forward limit
+            leg_directions[i] = -1
+        elif leg_angles[i] < -LEG_ANGLE_LIMIT:  # Backward limit
+            leg_directions[i] = 1
+
+def reachable_leg_poses():
+    # Walk the leg animation from its starting pose until it repeats,
+    # collecting every pose a tripod can show
+    leg_angles = [0, 0, 0]
+    leg_speeds = [LEG_SPEED] * 3
+    leg_directions = [1, 1, 1]
+    seen_states = set()
+    poses = []
+    while True:
+        state = (tuple(leg_angles), tuple(leg_directions))
+        if state in seen_states:
+            return poses
+        seen_states.add(state)
+        if state[0] not in poses:
+            poses.append(state[0])
+        step_legs(leg_angles, leg_speeds, leg_directions)
+
+class TripodAtlas:
+    # Pre-rendered tripod frames, one per reachable leg pose and tripod variant.
+    # Poses outside the precomputed walk are rendered lazily into a bounded cache.
+    def __init__(self, renderers, poses, max_extra_frames=64):
+        self.renderers = renderers
+        self.poses = poses
+        self.pose_index = {pose: i for i, pose in enumerate(poses)}
+        self.frames = {}
+        for variant, render in renderers.items():
+            self.frames[variant] = [render(list(pose)) for pose in poses]
+        self.extra_frames = OrderedDict()
+        self.max_extra_frames = max_extra_frames
+
+    def frame(self, variant, leg_angles):
+        pose = tuple(leg_angles)
+        index = self.pose_index.get(pose)
+        if index is not None:
+            return self.frames[variant][index]
+        
+        key = (variant, pose)
+        surface = self.extra_frames.get(key)
+        if surface is None:
+            surface = self.renderers[variant](list(pose))
+            self.extra_frames[key] = surface
+            if len(self.extra_frames) > self.max_extra_frames:
+                self.extra_frames.popitem(last=False)  # Drop least recently used frame
         else:
-            self.image.fill((255, 0, 0))  # Red for other aliens
-            self.damage = 5
+            self.extra_frames.move_to_end(key)
+        return surface
+
+tripod_atlas = TripodAtlas(
+    {"tripod": create_tripod, "boss": create_boss_tripod},
+    reachable_leg_poses()
+)
+
+def create_power_up(power_type, font):
+    surface = pygame.Surface((30, 30))
+    surface.fill((255, 255, 0))  # Yellow background
+    
+    # Set symbol and color based on power-up type
+    if power_type == "damage":
+        symbol = "⚔"
+        color = (255, 0, 0)  # Red
+    elif power_type == "health":
+        symbol = "❤"
+        color = (0, 255, 0)  # Green
+    elif power_type == "speed":
+        symbol = "⚡"
+        color = (0, 0, 255)  # Blue
+    else:  # A weapon
+        weapon = WEAPONS[power_type]
+        symbol = weapon.symbol
+        color = weapon.color
+    
+    # Render the symbol
+    symbol_text = font.render(symbol, True, color)
+    # Center the symbol on the power-up
+    symbol_rect = symbol_text.get_rect(center=(15, 15))
+    surface.blit(symbol_text, symbol_rect)
+    return surface
+
+# Player variants and power-up icons are drawn once and shared by every
+# sprite that shows them, keyed by what they show and their size
+class SpriteCache:
+    def __init__(self):
+        self.surfaces = {}
+        self.font = None  # Loaded on first use
+
+    def player(self, size=None):
+        key = ("player", size)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = create_player()
+            if size is not None:
+                surface = pygame.transform.scale(surface, size)
+            self.surfaces[key] = surface
+        return surface
+
+    def power_up(self, power_type):
+        key = ("power_up", power_type)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            if self.font is None:
+                self.font = pygame.font.Font(None, 36)
+            surface = create_power_up(power_type, self.font)
+            self.surfaces[key] = surface
+        return surface
+
+sprite_cache = SpriteCache()
+
+# Entity lifecycle states
+SPAWNING = "spawning"  # Created, not yet on screen
+ALIVE = "alive"
+DYING = "dying"  # Playing its destruction effect
+DEAD = "dead"  # Removed from every group
+
+SCREEN_RECT = pygame.Rect(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT)
+
+class Entity(pygame.sprite.Sprite):
+    dying_frames = 30  # Frames of destruction effect before removal
+
+    def __init__(self):
+        super().__init__()
+        self.state = SPAWNING
+        self.destruction_timer = 0
+
+    @property
+    def destroyed(self):
+        return self.state in (DYING, DEAD)
+
+    def destroy(self):
+        if self.state in (SPAWNING, ALIVE):
+            self.state = DYING
+            self.destruction_timer = 0
+            if self.dying_frames == 0:
+                self.retire()
+
+    def retire(self):
+        self.state = DEAD
+        self.kill()
+
+class LifecycleManager:
+    # Moves every spawned entity through spawning -> alive -> dying -> dead.
+    # Dying entities are removed once their effect has played, whatever their
+    # own update() does, so nothing can linger in the sprite groups.
+    def __init__(self):
+        self.entities = {}  # Used as an insertion-ordered set
+
+    def __len__(self):
+        return len(self.entities)
+
+    def spawn(self, entity, *groups):
+        for group in groups:
+            group.add(entity)
+        self.entities[entity] = None
+        return entity
+
+    def update(self):
+        for entity in list(self.entities):
+            if entity.state == SPAWNING and entity.rect.colliderect(SCREEN_RECT):
+                entity.state = ALIVE
+            elif entity.state == DYING:
+                entity.destruction_timer += 1
+                if entity.destruction_timer >= entity.dying_frames:
+                    entity.retire()
             
-        self.rect = self.image.get_rect()
-        self.rect.centerx = x
-        self.rect.centery = y
-        self.speed = 10
-        self.angle = 0
+            # Also catches entities killed directly or emptied out of their groups
+            if entity.state == DEAD or not entity.alive():
+                entity.state = DEAD
+                del self.entities[entity]
+
+    def clear(self):
+        for entity in self.entities:
+            entity.state = DEAD
+        self.entities.clear()
+
+    def counts(self):
+        # Live entities per type and state, e.g. {"UFO": {"alive": 2, "dying": 1}}
+        counts = {}
+        for entity in self.entities:
+            by_state = counts.setdefault(type(entity).__name__, {})
+            by_state[entity.state] = by_state.get(entity.state, 0) + 1
+        return counts
+
+def collide_living(sprite, entity):
+    # Dying entities no longer absorb hits
+    return not entity.destroyed and sprite.rect.colliderect(entity.rect)
+
+# Sprites that are recycled through a Pool instead of being garbage collected
+class PooledSprite(pygame.sprite.Sprite):
+    pool = None
+    pooled = False
+    owner = None
+
+    def kill(self):
+        super().kill()
+        self.owner = None  # Don't keep the shooter alive while sitting in the pool
+        if self.pool is not None:
+            self.pool.release(self)
+
+class Pool:
+    # Hands out recycled objects when available. Objects need a reset() that
+    # takes the same arguments as the constructor.
+    def __init__(self, factory, max_size=256):
+        self.factory = factory
+        self.max_size = max_size
+        self.free = []
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, *args, **kwargs):
+        if self.free:
+            obj = self.free.pop()
+            obj.reset(*args, **kwargs)
+            self.hits += 1
+        else:
+            obj = self.factory(*args, **kwargs)
+            obj.pool = self
+            self.misses += 1
+        obj.pooled = False
+        return obj
+
+    def release(self, obj):
+        if obj.pooled:  # Already released, e.g. killed twice
+            return
+        obj.pooled = True
+        if len(self.free) < self.max_size:
+            self.free.append(obj)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "free": len(self.free)}
+
+# Pre-filled surfaces shared by every projectile of the same size and colour
+solid_surfaces = {}
+
+def solid_surface(size, color):
+    surface = solid_surfaces.get((size, color))
+    if surface is None:
+        surface = pygame.Surface(size)
+        surface.fill(color)
+        solid_surfaces[(size, color)] = surface
+    return surface
+
+# Player weapons and enemy projectiles, loaded once from data/weapons.json.
+# A weapon with ammo set to null never runs out. Damage is what a hit deals
+# and spread lists the angle offsets of the lasers fired per shot.
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+Weapon = namedtuple('Weapon', ['name', 'color', 'damage', 'speed', 'spread', 'ammo', 'fire_delay',
+                               'symbol', 'power_up_weight', 'building_damage', 'image'])
+
+def load_weapons(path=os.path.join(DATA_DIR, 'weapons.json')):
+    with open(path, encoding='utf-8') as file:
+        table = json.load(file)
+    weapons = {}
+    for name, spec in table.items():
+        color = tuple(spec['color'])
+        weapons[name] = Weapon(
+            name=name,
+            color=color,
+            damage=spec['damage'],
+            speed=spec['speed'],
+            spread=tuple(spec.get('spread', [0])),
+            ammo=spec.get('ammo'),
+            fire_delay=spec.get('fire_delay', 0),
+            symbol=spec.get('symbol'),
+            power_up_weight=spec.get('power_up_weight', 0),
+            building_damage=spec.get('building_damage', 0),
+            image=solid_surface((10, 5), color),  # Pre-coloured laser shared by every shot
+        )
+    return weapons
+
+WEAPONS = load_weapons()
+
+# Projectiles keep a float position and a velocity worked out once from their
+# angle. The rect is only rounded from the position for drawing and
+# collisions, so shallow shots no longer lose their fractional movement.
+class Projectile(PooledSprite):
+    heading = 1  # -1 flies the opposite way to the angle
+    player_damage = 0  # Set by Simulation.fire_hostile for hostile shots
+    building_damage = 0
+
+    def launch(self, x, y, speed, angle):
+        # Called from every reset(), so a recycled shot never keeps the
+        # shooter or damage of the one it was before
+        self.owner = None
+        self.player_damage = 0
+        self.building_damage = 0
+        self.position = pygame.math.Vector2(x, y)
+        self.speed = speed
+        self.angle = angle
+
+    @property
+    def angle(self):
+        return self._angle
+
+    @angle.setter
+    def angle(self, angle):
+        self._angle = angle
+        self.velocity = pygame.math.Vector2(self.heading * self.speed, 0).rotate(angle)
+
+    def move(self):
+        self.position += self.velocity
+        self.rect.center = (round(self.position.x), round(self.position.y))
+
+class Laser(Projectile):
+    def __init__(self, x, y, shooter_type="laser"):
+        super().__init__()
+        self.reset(x, y, shooter_type)
+
+    def reset(self, x, y, shooter_type="laser"):
+        # Look up color, damage and speed for whoever fired it
+        weapon = WEAPONS[shooter_type]
+        self.weapon = weapon
+        self.color = weapon.color
+        self.damage = weapon.damage
+        self.image = weapon.image
+        self.rect = self.image.get_rect(center=(x, y))
+        self.launch(x, y, weapon.speed, 0)  # Callers aim it by setting angle
 
     def update(self):
         # Move in the direction of the angle
-        self.rect.x += self.speed * math.cos(math.radians(self.angle))
-        self.rect.y += self.speed * math.sin(math.radians(self.angle))
+        self.move()
         
         # Kill if off screen
         if (self.rect.right < 0 or self.rect.left > WINDOW_WIDTH or 
@@ -351,9 +702,10 @@ class Laser(pygame.sprite.Sprite):
             self.kill()
 
 class Player(pygame.sprite.Sprite):
-    def __init__(self):
+    def __init__(self, sim):
         super().__init__()
-        self.image = create_player()
+        self.sim = sim
+        self.image = sprite_cache.player()
         self.rect = self.image.get_rect()
         self.rect.centerx = WINDOW_WIDTH // 4
         self.rect.bottom = WINDOW_HEIGHT - 20
@@ -367,8 +719,8 @@ class Player(pygame.sprite.Sprite):
         self.power_up = False
         self.power_up_timer = 0
         self.last_health = 100
-        self.shoot_delay = 250
-        self.last_shot = pygame.time.get_ticks()
+        self.shoot_delay = WEAPONS["laser"].fire_delay
+        self.last_shot = sim.time_ms
         self.level = 1
         self.aliens_defeated = 0
         self.aliens_needed = 5
@@ -378,18 +730,15 @@ class Player(pygame.sprite.Sprite):
         self.current_weapon = "laser"
         self.weapon_timer = 0
         self.weapon_duration = 0
-        self.rpg_ammo = 0
-        self.assault_rifle_ammo = 0
-        self.finger_gun_ammo = 0
-        self.pistol_ammo = 0
-        self.sniper_ammo = 0
+        # Rounds left for every weapon that can run out
+        self.ammo = {name: 0 for name, weapon in WEAPONS.items() if weapon.ammo is not None}
 
     def update(self):
-        keys = pygame.key.get_pressed()
+        inputs = self.sim.inputs
         
-        if keys[pygame.K_LEFT]:
+        if inputs.left:
             self.rect.x -= self.speed
-        if keys[pygame.K_RIGHT]:
+        if inputs.right:
             self.rect.x += self.speed
             
         self.velocity_y += self.gravity
@@ -409,119 +758,87 @@ class Player(pygame.sprite.Sprite):
             self.power_up_timer -= 1
             if self.power_up_timer <= 0:
                 self.power_up = False
-                self.image = create_player()
+                self.image = sprite_cache.player()
                 self.damage_boost = 0
 
     def jump(self):
         if not self.jumping:
             self.velocity_y = self.jump_power
             self.jumping = True
-            jump_sound.play()
+            self.sim.play('jump')
 
     def shoot(self):
-        now = pygame.time.get_ticks()
+        now = self.sim.time_ms
         if now - self.last_shot > self.shoot_delay:
             self.last_shot = now
             
             # Calculate angle based on mouse position
-            mouse_pos = pygame.mouse.get_pos()
+            mouse_pos = self.sim.inputs.aim
             dx = mouse_pos[0] - self.rect.centerx
             dy = mouse_pos[1] - self.rect.centery
             angle = math.degrees(math.atan2(dy, dx))
             
-            # Create laser based on current weapon
-            if self.current_weapon == "rpg" and self.rpg_ammo > 0:
-                laser = Laser(self.rect.centerx, self.rect.centery, "rpg")
-                laser.angle = angle
-                laser.speed = 8
-                laser.damage = 20
-                self.rpg_ammo -= 1
-                all_sprites.add(laser)
-                lasers.add(laser)
-                laser_sound.play()
-            elif self.current_weapon == "assault_rifle" and self.assault_rifle_ammo > 0:
-                # Create spread shot
-                for spread in [-10, -5, 0, 5, 10]:
-                    laser = Laser(self.rect.centerx, self.rect.centery, "assault_rifle")
-                    laser.angle = angle + spread
-                    laser.speed = 15
-                    laser.damage = 3
-                    self.assault_rifle_ammo -= 1
-                    all_sprites.add(laser)
-                    lasers.add(laser)
-                laser_sound.play()
-            elif self.current_weapon == "pistol" and self.pistol_ammo > 0:
-                laser = Laser(self.rect.centerx, self.rect.centery, "pistol")
-                laser.angle = angle
-                laser.speed = 14
-                laser.damage = 8
-                self.pistol_ammo -= 1
-                all_sprites.add(laser)
-                lasers.add(laser)
-                laser_sound.play()
-            elif self.current_weapon == "sniper" and self.sniper_ammo > 0:
-                laser = Laser(self.rect.centerx, self.rect.centery, "sniper")
-                laser.angle = angle
-                laser.speed = 25
-                laser.damage = 25
-                self.sniper_ammo -= 1
-                all_sprites.add(laser)
-                lasers.add(laser)
-                laser_sound.play()
-            elif self.current_weapon == "finger_gun" and self.finger_gun_ammo > 0:
-                laser = Laser(self.rect.centerx, self.rect.centery, "finger_gun")
-                laser.angle = angle
-                laser.speed = 20
-                laser.damage = 50
-                self.finger_gun_ammo -= 1
-                all_sprites.add(laser)
-                lasers.add(laser)
-                laser_sound.play()
-            else:
-                # Default laser
-                laser = Laser(self.rect.centerx, self.rect.centery, "player")
-                laser.angle = angle
-                laser.speed = 12
-                all_sprites.add(laser)
-                lasers.add(laser)
-                laser_sound.play()
+            # Fire the current weapon, or the default laser once it is out of ammo
+            weapon = WEAPONS[self.current_weapon]
+            if weapon.ammo is not None and self.ammo[weapon.name] <= 0:
+                weapon = WEAPONS["laser"]
+            for spread in weapon.spread:
+                laser = laser_pool.acquire(self.rect.centerx, self.rect.centery, weapon.name)
+                laser.angle = angle + spread
+                self.sim.add_player_laser(laser)
+            if weapon.ammo is not None:
+                self.ammo[weapon.name] -= len(weapon.spread)  # One round per laser
+            self.sim.play('laser')
 
-class Alien(pygame.sprite.Sprite):
-    def __init__(self, level, alien_type="basic"):
+    def equip(self, name):
+        # Switch to a weapon with a full load of ammo
+        weapon = WEAPONS[name]
+        self.current_weapon = name
+        self.ammo[name] = weapon.ammo
+        self.shoot_delay = weapon.fire_delay
+        self.weapon_duration = 300  # 5 seconds
+        self.weapon_timer = 300
+
+class Alien(Entity):
+    def __init__(self, sim, level, alien_type="basic"):
         super().__init__()
+        self.sim = sim
+        self.spawn_tick = sim.tick
         self.alien_type = alien_type
         # Initialize leg angles (120 degrees apart)
         self.leg_angles = [0, 0, 0]  # All legs start at 0
-        self.leg_speeds = [2, 2, 2]  # Speed of each leg's movement
+        self.leg_speeds = [LEG_SPEED] * 3  # Speed of each leg's movement
         self.leg_directions = [1, 1, 1]  # 1 for forward, -1 for backward
         self.animation_timer = 0
         self.animation_delay = 2  # Lower number = faster animation
         
+        rng = sim.random.get("aliens")
+        
         # Set properties based on alien type
         if alien_type == "basic":
-            self.image = create_tripod(self.leg_angles)
-            self.speed = random.randint(3 + level, 6 + level)
+            self.image = tripod_atlas.frame("tripod", self.leg_angles)
+            self.speed = rng.randint(3 + level, 6 + level)
             self.health = 2 + (level // 2)
             self.attack_delay = 120
             self.damage = 5
             self.color = (100, 100, 100)
         elif alien_type == "fast":
-            self.image = create_tripod(self.leg_angles)
-            self.speed = random.randint(6 + level, 9 + level)
+            self.image = tripod_atlas.frame("tripod", self.leg_angles)
+            self.speed = rng.randint(6 + level, 9 + level)
             self.health = 1 + (level // 3)
             self.attack_delay = 180
             self.damage = 3
             self.color = (0, 255, 0)
         elif alien_type == "tank":
-            self.image = create_tripod(self.leg_angles)
-            self.speed = random.randint(2 + level, 4 + level)
+            self.image = tripod_atlas.frame("tripod", self.leg_angles)
+            self.speed = rng.randint(2 + level, 4 + level)
             self.health = 4 + (level // 2)
             self.attack_delay = 90
             self.damage = 8
             self.color = (128, 128, 128)
         elif alien_type == "shooter":
-            self.image = create_tripod(self.leg_angles)
-            self.speed = random.randint(2 + level, 4 + level)
+            self.image = tripod_atlas.frame("tripod", self.leg_angles)
+            self.speed = rng.randint(2 + level, 4 + level)
             self.health = 2 + (level // 3)
             self.attack_delay = 60
             self.damage = 4
@@ -532,44 +849,24 @@ class Alien(pygame.sprite.Sprite):
         self.rect.bottom = WINDOW_HEIGHT - 20
         self.level = level
         self.attack_timer = 0
-        self.lasers = pygame.sprite.Group()
-        self.destroyed = False  # Add destroyed attribute
-        self.destruction_timer = 0
         self.destruction_particles = []
 
     def update(self):
         if self.destroyed:
-            self.destruction_timer += 1
+            # The lifecycle manager removes it after dying_frames
             if self.destruction_timer % 2 == 0:  # Add debris every other frame
-                for _ in range(12):  # Increased number of debris particles
-                    debris = Debris(
-                        random.randint(self.rect.left, self.rect.right),
-                        random.randint(self.rect.top, self.rect.bottom),
-                        self.color
-                    )
-                    all_sprites.add(debris)
-            if self.destruction_timer >= 30:  # Kill after 30 frames of destruction
-                self.kill()
+                self.sim.particles.emit(self.rect, self.color, self.sim.debris(12))  # Increased number of debris particles
             return
 
         self.rect.x -= self.speed
         
         # Animate legs
         self.animation_timer += 1
-        if self.animation_timer >= self.animation_delay:
+        if self.animation_timer >= self.animation_delay * self.sim.quality.animation_scale:
             self.animation_timer = 0
-            for i in range(3):
-                # Update leg angle
-                self.leg_angles[i] += self.leg_speeds[i] * self.leg_directions[i]
-                
-                # Change direction if leg reaches limits
-                if self.leg_angles[i] > 15:  # Forward limit
-                    self.leg_directions[i] = -1
-                elif self.leg_angles[i] < -15:  # Backward limit
-                    self.leg_directions[i] = 1
-        
-        # Update alien image with new leg angles
-        self.image = create_tripod(self.leg_angles)
+            step_legs(self.leg_angles, self.leg_speeds, self.leg_directions)
+            # Pick the pre-rendered frame for the new leg pose
+            self.image = tripod_atlas.frame("tripod", self.leg_angles)
         
         # Attack pattern based on alien type
         self.attack_timer += 1
@@ -577,51 +874,42 @@ class Alien(pygame.sprite.Sprite):
             self.attack_timer = 0
             if self.alien_type == "shooter":
                 # Shooter aliens shoot in a spread pattern
-                for angle in [-30, -15, 0, 15, 30]:
-                    laser = Laser(self.rect.left, self.rect.centery, "shooter")
-                    laser.speed = 8
+                for angle in WEAPONS["shooter"].spread:
+                    laser = laser_pool.acquire(self.rect.left, self.rect.centery, "shooter")
                     laser.angle = angle
-                    all_sprites.add(laser)
-                    self.lasers.add(laser)
+                    self.sim.fire_hostile(laser, self, player_damage=laser.damage)
             else:
                 # All aliens shoot at player
-                laser = Laser(self.rect.left, self.rect.centery, "alien")
+                laser = laser_pool.acquire(self.rect.left, self.rect.centery, "alien")
                 # Calculate angle to player
-                dx = player.rect.centerx - self.rect.centerx
-                dy = player.rect.centery - self.rect.centery
+                dx = self.sim.player.rect.centerx - self.rect.centerx
+                dy = self.sim.player.rect.centery - self.rect.centery
                 angle = math.degrees(math.atan2(dy, dx))
                 laser.angle = angle
-                laser.speed = 8
-                all_sprites.add(laser)
-                self.lasers.add(laser)
+                self.sim.fire_hostile(laser, self, player_damage=laser.damage)
         
         if self.rect.right < 0:
-            self.kill()
+            self.retire()
 
 class PowerUp(pygame.sprite.Sprite):
-    def __init__(self):
+    def __init__(self, sim):
         super().__init__()
-        self.image = pygame.Surface((30, 30))
-        self.image.fill((255, 255, 0))  # Yellow background
-        
-        # Create a font for the symbol
-        font = pygame.font.Font(None, 36)
+        rng = sim.random.get("power_ups")
         
-        # Define power-up types with their rarity (higher number = rarer)
+        # Define power-up types with their rarity (higher number = rarer).
+        # Weapon power-ups come from the weapon table.
         power_types = {
             "damage": 30,
             "health": 20,
             "speed": 15,
-            "rpg": 10,
-            "assault_rifle": 8,
-            "pistol": 12,
-            "sniper": 5,
-            "finger_gun": 2
         }
+        for name, weapon in WEAPONS.items():
+            if weapon.power_up_weight:
+                power_types[name] = weapon.power_up_weight
         
         # Choose power-up type based on rarity
         total_weight = sum(power_types.values())
-        random_num = random.randint(1, total_weight)
+        random_num = rng.randint(1, total_weight)
         current_sum = 0
         for power_type, weight in power_types.items():
             current_sum += weight
@@ -629,41 +917,11 @@ class PowerUp(pygame.sprite.Sprite):
                 self.power_type = power_type
                 break
         
-        # Set symbol and color based on power-up type
-        if self.power_type == "damage":
-            symbol = "⚔"
-            color = (255, 0, 0)  # Red
-        elif self.power_type == "health":
-            symbol = "❤"
-            color = (0, 255, 0)  # Green
-        elif self.power_type == "speed":
-            symbol = "⚡"
-            color = (0, 0, 255)  # Blue
-        elif self.power_type == "rpg":
-            symbol = "🚀"
-            color = (255, 165, 0)  # Orange
-        elif self.power_type == "assault_rifle":
-            symbol = "🔫"
-            color = (128, 128, 128)  # Gray
-        elif self.power_type == "pistol":
-            symbol = "🔪"
-            color = (192, 192, 192)  # Silver
-        elif self.power_type == "sniper":
-            symbol = "🎯"
-            color = (0, 255, 255)  # Cyan
-        else:  # finger_gun
-            symbol = "👆"
-            color = (255, 192, 203)  # Pink
-            
-        # Render the symbol
-        symbol_text = font.render(symbol, True, color)
-        # Center the symbol on the power-up
-        symbol_rect = symbol_text.get_rect(center=(15, 15))
-        self.image.blit(symbol_text, symbol_rect)
-        
+        # Icon for the chosen type, drawn once and shared
+        self.image = sprite_cache.power_up(self.power_type)
         self.rect = self.image.get_rect()
-        self.rect.x = random.randint(0, WINDOW_WIDTH - 30)
-        self.rect.y = random.randint(-100, -30)  # Start above the screen
+        self.rect.x = rng.randint(0, WINDOW_WIDTH - 30)
+        self.rect.y = rng.randint(-100, -30)  # Start above the screen
         self.speed = 2
         self.rotation = 0
         self.rotation_speed = 2
@@ -685,53 +943,30 @@ class PowerUp(pygame.sprite.Sprite):
         if self.power_type == "damage":
             player.power_up = True
             player.power_up_timer = 180  # 3 seconds of power-up
-            player.image = pygame.transform.scale(create_player(), (60, 90))  # Bigger player
+            player.image = sprite_cache.player((60, 90))  # Bigger player
             player.damage_boost = 2  # Add 2 damage during power-up
         elif self.power_type == "health":
             player.health = min(100, player.health + 30)  # Heal 30 HP
         elif self.power_type == "speed":
             player.speed = 7  # Increased speed
-            pygame.time.set_timer(pygame.USEREVENT, 5000)  # Reset after 5 seconds
-            def reset_speed():
-                player.speed = 5
-            pygame.time.set_timer(pygame.USEREVENT, 0)  # Clear the timer
-        elif self.power_type == "rpg":
-            player.current_weapon = "rpg"
-            player.rpg_ammo = 5
-            player.weapon_duration = 300  # 5 seconds
-            player.weapon_timer = 300
-        elif self.power_type == "assault_rifle":
-            player.current_weapon = "assault_rifle"
-            player.assault_rifle_ammo = 30
-            player.weapon_duration = 300  # 5 seconds
-            player.weapon_timer = 300
-        elif self.power_type == "pistol":
-            player.current_weapon = "pistol"
-            player.pistol_ammo = 15
-            player.weapon_duration = 300  # 5 seconds
-            player.weapon_timer = 300
-        elif self.power_type == "sniper":
-            player.current_weapon = "sniper"
-            player.sniper_ammo = 8
-            player.weapon_duration = 300  # 5 seconds
-            player.weapon_timer = 300
-        elif self.power_type == "finger_gun":
-            player.current_weapon = "finger_gun"
-            player.finger_gun_ammo = 10
-            player.weapon_duration = 300  # 5 seconds
-            player.weapon_timer = 300
-
-class BossAlien(pygame.sprite.Sprite):
-    def __init__(self, level):
+        else:  # A weapon
+            player.equip(self.power_type)
+
+class BossAlien(Entity):
+    dying_frames = 0  # Removed as soon as it is defeated
+
+    def __init__(self, sim, level):
         super().__init__()
+        self.sim = sim
+        self.spawn_tick = sim.tick
         # Initialize leg angles (120 degrees apart)
         self.leg_angles = [0, 0, 0]  # All legs start at 0
-        self.leg_speeds = [2, 2, 2]  # Speed of each leg's movement
+        self.leg_speeds = [LEG_SPEED] * 3  # Speed of each leg's movement
         self.leg_directions = [1, 1, 1]  # 1 for forward, -1 for backward
         self.animation_timer = 0
         self.animation_delay = 2  # Lower number = faster animation
         
-        self.image = create_boss_tripod(self.leg_angles)
+        self.image = tripod_atlas.frame("boss", self.leg_angles)
         self.rect = self.image.get_rect()
         self.rect.right = WINDOW_WIDTH + 50
         self.rect.bottom = WINDOW_HEIGHT - 20
@@ -740,62 +975,58 @@ class BossAlien(pygame.sprite.Sprite):
         self.level = level
         self.attack_timer = 0
         self.attack_delay = 60  # Attack every second
-        self.energy_balls = pygame.sprite.Group()
 
     def update(self):
+        if self.destroyed:
+            return
+        
         # Move towards player
         if self.rect.right > WINDOW_WIDTH - 100:
             self.rect.x -= self.speed
         
         # Animate legs
         self.animation_timer += 1
-        if self.animation_timer >= self.animation_delay:
+        if self.animation_timer >= self.animation_delay * self.sim.quality.animation_scale:
             self.animation_timer = 0
-            for i in range(3):
-                # Update leg angle
-                self.leg_angles[i] += self.leg_speeds[i] * self.leg_directions[i]
-                
-                # Change direction if leg reaches limits
-                if self.leg_angles[i] > 15:  # Forward limit
-                    self.leg_directions[i] = -1
-                elif self.leg_angles[i] < -15:  # Backward limit
-                    self.leg_directions[i] = 1
-        
-        # Update boss image with new leg angles
-        self.image = create_boss_tripod(self.leg_angles)
+            step_legs(self.leg_angles, self.leg_speeds, self.leg_directions)
+            # Pick the pre-rendered frame for the new leg pose
+            self.image = tripod_atlas.frame("boss", self.leg_angles)
         
         # Attack pattern
         self.attack_timer += 1
         if self.attack_timer >= self.attack_delay:
             self.attack_timer = 0
             # Create energy ball
-            energy_ball = EnergyBall(self.rect.centerx, self.rect.centery)
-            energy_ball.image.fill((255, 0, 255))  # Purple for boss energy balls
-            all_sprites.add(energy_ball)
-            self.energy_balls.add(energy_ball)
-            boss_sound.play()  # Play boss sound when shooting
-
-class EnergyBall(pygame.sprite.Sprite):
-    def __init__(self, x, y):
+            angle = self.sim.random.get("combat").uniform(-30, 30)  # Random angle for spread shot
+            energy_ball = energy_ball_pool.acquire(self.rect.centerx, self.rect.centery, angle,
+                                                   (255, 0, 255))  # Purple for boss energy balls
+            if self.sim.fire_hostile(energy_ball, self, player_damage=5):
+                self.sim.play('boss')  # Play boss sound when shooting
+
+class EnergyBall(Projectile):
+    heading = -1  # Fired back towards the left of the screen
+
+    def __init__(self, x, y, angle, color=(255, 255, 0)):  # Yellow energy ball by default
         super().__init__()
-        self.image = pygame.Surface((20, 20))
-        self.image.fill((255, 255, 0))  # Yellow energy ball
-        self.rect = self.image.get_rect()
-        self.rect.centerx = x
-        self.rect.centery = y
-        self.speed = 5
-        self.angle = random.uniform(-30, 30)  # Random angle for spread shot
+        self.reset(x, y, angle, color)
+
+    def reset(self, x, y, angle, color=(255, 255, 0)):
+        self.color = color
+        self.image = solid_surface((20, 20), color)
+        self.rect = self.image.get_rect(center=(x, y))
+        self.launch(x, y, 5, angle)
 
     def update(self):
         # Move in the direction of the angle
-        self.rect.x -= self.speed * math.cos(math.radians(self.angle))
-        self.rect.y -= self.speed * math.sin(math.radians(self.angle))
+        self.move()
         if self.rect.right < 0 or self.rect.left > WINDOW_WIDTH or self.rect.bottom < 0:
             self.kill()
 
-class UFO(pygame.sprite.Sprite):
-    def __init__(self, level):
+class UFO(Entity):
+    def __init__(self, sim, level):
         super().__init__()
+        self.sim = sim
+        self.spawn_tick = sim.tick
         self.image = pygame.Surface((40, 20))
         self.image.fill((0, 255, 255))  # Cyan color for UFO
         # Draw UFO shape
@@ -804,136 +1035,191 @@ class UFO(pygame.sprite.Sprite):
         
         self.rect = self.image.get_rect()
         self.rect.x = WINDOW_WIDTH + 50
-        self.rect.y = random.randint(50, WINDOW_HEIGHT - 100)  # Random height
-        self.speed = random.randint(2 + level, 4 + level)
+        rng = sim.random.get("aliens")
+        self.rect.y = rng.randint(50, WINDOW_HEIGHT - 100)  # Random height
+        self.speed = rng.randint(2 + level, 4 + level)
         self.health = 1 + (level // 2)
         self.attack_delay = 90
         self.attack_timer = 0
-        self.lasers = pygame.sprite.Group()
         self.level = level
         self.color = (0, 255, 255)  # Add color attribute for explosion effects
-        self.destroyed = False
-        self.destruction_timer = 0
 
     def update(self):
         if self.destroyed:
-            self.destruction_timer += 1
+            # The lifecycle manager removes it after dying_frames
             if self.destruction_timer % 2 == 0:  # Add debris every other frame
-                for _ in range(12):  # More debris for UFOs
-                    debris = Debris(
-                        random.randint(self.rect.left, self.rect.right),
-                        random.randint(self.rect.top, self.rect.bottom),
-                        self.color
-                    )
-                    all_sprites.add(debris)
+                self.sim.particles.emit(self.rect, self.color, self.sim.debris(12))  # More debris for UFOs
             return
 
         self.rect.x -= self.speed
         
         # Move up and down in a wave pattern
-        self.rect.y += math.sin(pygame.time.get_ticks() * 0.005) * 2
+        self.rect.y += math.sin(self.sim.time_ms * 0.005) * 2
         
-        # Attack pattern - shoot at buildings
+        # Attack pattern - shoot at buildings. The simulation picks the
+        # closest building for every UFO firing this tick in one go.
         self.attack_timer += 1
         if self.attack_timer >= self.attack_delay:
             self.attack_timer = 0
-            # Find closest building
-            closest_building = None
-            closest_distance = float('inf')
-            
-            for building in buildings:
-                if not building.destroyed:
-                    distance = math.sqrt((building.rect.centerx - self.rect.centerx)**2 + 
-                                      (building.rect.centery - self.rect.centery)**2)
-                    if distance < closest_distance:
-                        closest_distance = distance
-                        closest_building = building
-            
-            if closest_building:
-                # Shoot at building
-                laser = Laser(self.rect.left, self.rect.centery, "ufo")
-                # Calculate angle to building
-                dx = closest_building.rect.centerx - self.rect.centerx
-                dy = closest_building.rect.centery - self.rect.centery
-                angle = math.degrees(math.atan2(dy, dx))
-                laser.angle = angle
-                laser.speed = 8
-                all_sprites.add(laser)
-                self.lasers.add(laser)
-                ufo_sound.play()  # Play UFO sound when shooting
+            self.sim.ufo_shots.append(self)
         
         if self.rect.right < 0:
-            self.kill()
+            self.retire()
+
+    def fire_at(self, building):
+        # Shoot at building
+        laser = laser_pool.acquire(self.rect.left, self.rect.centery, "ufo")
+        # Calculate angle to building
+        dx = building.rect.centerx - self.rect.centerx
+        dy = building.rect.centery - self.rect.centery
+        angle = math.degrees(math.atan2(dy, dx))
+        laser.angle = angle
+        if self.sim.fire_hostile(laser, self, player_damage=laser.damage,
+                                 building_damage=laser.weapon.building_damage):
+            self.sim.play('ufo')  # Play UFO sound when shooting
+
+# Centres of the intact buildings in one NumPy array for nearest-building
+# queries. Buildings stand still until they are destroyed, so the array is
+# only rebuilt after a building is added or destroyed.
+class BuildingIndex:
+    def __init__(self, buildings):
+        self.group = buildings
+        self.buildings = []
+        self.centers = numpy.zeros((0, 2))
+        self.stale = True
+
+    def invalidate(self):
+        self.stale = True
 
-class Building(pygame.sprite.Sprite):
-    def __init__(self, x, y):
+    def rebuild(self):
+        self.buildings = [building for building in self.group if not building.destroyed]
+        self.centers = numpy.array([building.rect.center for building in self.buildings],
+                                   dtype=float).reshape(-1, 2)
+        self.stale = False
+
+    def closest(self, points):
+        # The closest intact building to each (x, y) point, or None for all of
+        # them when every building is gone. Ties go to the earliest building.
+        if self.stale:
+            self.rebuild()
+        if not self.buildings:
+            return [None] * len(points)
+        offsets = self.centers[numpy.newaxis, :, :] - numpy.asarray(points, dtype=float)[:, numpy.newaxis, :]
+        distances = (offsets ** 2).sum(axis=2)
+        return [self.buildings[index] for index in distances.argmin(axis=1).tolist()]
+
+def create_building():
+    surface = pygame.Surface((60, 120))
+    surface.fill((100, 100, 100))  # Gray building
+    # Add windows
+    for i in range(3):
+        for j in range(4):
+            pygame.draw.rect(surface, (255, 255, 0), (10 + i*15, 20 + j*25, 10, 15))
+    return surface
+
+# The fire on a burning building is a short loop of frames baked once, with
+# the same rising embers and orange glow the old per-frame effect drew.
+# Every building shares one animation and just picks a frame.
+class FireAnimation:
+    def __init__(self, base, frame_count=40, ember_life=20, embers=3, glow=True, seed=0):
+        rng = random.Random(seed)  # Cosmetic only, keeps the game's random streams untouched
+        width, height = base.get_size()
+        
+        # A few embers start every other frame: (start frame, x, y, rising speed)
+        ember_starts = [
+            (start, rng.randint(0, width), rng.randint(0, height), rng.randint(2, 5))
+            for start in range(0, frame_count, 2)
+            for _ in range(embers)
+        ]
+        
+        # Fire glow effect, laid over every frame
+        self.glow = pygame.Surface((width, height), pygame.SRCALPHA)
+        self.glow.fill((255, 100, 0, 30))
+        
+        self.frames = []
+        for frame in range(frame_count):
+            image = base.copy()
+            for start, x, y, speed in ember_starts:
+                # Ages wrap around so embers started near the end of the loop
+                # carry on into its first frames
+                age = (frame - start) % frame_count + 1
+                if age <= ember_life:
+                    color = (255, rng.randint(100, 200), 0)
+                    pygame.draw.circle(image, color, (x, y - age * speed), 2)
+            if glow:
+                image.blit(self.glow, (0, 0))
+            self.frames.append(image)
+
+    def frame(self, timer):
+        return self.frames[timer % len(self.frames)]
+
+# Rotated copies of an image, filled in as they are first needed and kept
+# for the rest of the run. Falling buildings only ever use a few dozen angles.
+rotation_cache = {}
+
+def rotated_surface(image, angle, direction):
+    key = (id(image), angle, direction)
+    entry = rotation_cache.get(key)
+    if entry is None or entry[0] is not image:  # id() may be reused by a new image
+        entry = (image, pygame.transform.rotate(image, angle * direction))
+        rotation_cache[key] = entry
+    return entry[1]
+
+# Quality tiers, best first. The governor in main() steps through them when
+# frames run over budget. They only change what is drawn: fewer debris
+# particles, fewer fire embers, slower leg animation and no fire glow.
+QualityTier = namedtuple('QualityTier', ['name', 'debris_scale', 'embers', 'animation_scale', 'glow'])
+
+QUALITY_TIERS = [
+    QualityTier('high', 1.0, 3, 1, True),
+    QualityTier('medium', 0.6, 2, 2, True),
+    QualityTier('low', 0.25, 1, 3, False),
+]
+
+building_image = create_building()
+
+# One baked fire loop per quality tier, all made up front so that dropping a
+# tier mid-game doesn't stall the very frame that was already running late
+fire_animations = {tier.name: FireAnimation(building_image, embers=tier.embers, glow=tier.glow)
+                   for tier in QUALITY_TIERS}
+
+def fire_animation(tier):
+    return fire_animations[tier.name]
+
+charred_building = solid_surface((60, 120), (50, 50, 50))  # Shown the frame a building is destroyed
+
+class Building(Entity):
+    dying_frames = 120  # Upper bound, it normally falls off screen sooner
+
+    def __init__(self, sim, x, y):
         super().__init__()
-        self.image = pygame.Surface((60, 120))
-        self.image.fill((100, 100, 100))  # Gray building
-        # Add windows
-        for i in range(3):
-            for j in range(4):
-                pygame.draw.rect(self.image, (255, 255, 0), (10 + i*15, 20 + j*25, 10, 15))
+        self.sim = sim
+        self.image = building_image
         self.rect = self.image.get_rect()
         self.rect.x = x
         self.rect.bottom = WINDOW_HEIGHT - 20
         self.health = 100
-        self.destroyed = False
         self.on_fire = False
         self.fire_animation_timer = 0
-        self.fire_particles = []
-        self.original_image = self.image.copy()
-        self.destruction_timer = 0
-        self.destruction_particles = []
+        self.original_image = building_image
         self.fall_angle = 0  # Angle for falling animation
         self.fall_speed = 0  # Speed of falling
-        self.fall_direction = random.choice([-1, 1])  # Random direction to fall
+        self.rng = sim.random.get("buildings")
+        self.fall_direction = self.rng.choice([-1, 1])  # Random direction to fall
 
     def update(self):
         if self.on_fire:
             self.fire_animation_timer += 1
-            self.image = self.original_image.copy()
-            
-            # Add fire particles
-            if self.fire_animation_timer % 2 == 0:
-                for _ in range(3):
-                    particle = {
-                        'x': random.randint(0, 60),
-                        'y': random.randint(0, 120),
-                        'speed': random.randint(2, 5),
-                        'life': 20
-                    }
-                    self.fire_particles.append(particle)
-            
-            # Update and draw fire particles
-            for particle in self.fire_particles[:]:
-                particle['y'] -= particle['speed']
-                particle['life'] -= 1
-                
-                # Draw fire particle
-                color = (255, random.randint(100, 200), 0)
-                pygame.draw.circle(self.image, color, 
-                                 (int(particle['x']), int(particle['y'])), 2)
-                
-                if particle['life'] <= 0:
-                    self.fire_particles.remove(particle)
-            
-            # Add fire glow effect
-            glow_surface = pygame.Surface((60, 120), pygame.SRCALPHA)
-            glow_color = (255, 100, 0, 30)
-            pygame.draw.rect(glow_surface, glow_color, (0, 0, 60, 120))
-            self.image.blit(glow_surface, (0, 0))
+            self.image = fire_animation(self.sim.quality).frame(self.fire_animation_timer)
 
         if self.destroyed:
-            self.destruction_timer += 1
-            
             # Update falling animation
             if self.fall_angle < 90:  # Only fall up to 90 degrees
                 self.fall_angle += 2
                 self.fall_speed += 0.5  # Accelerate falling
                 
                 # Rotate the building
-                self.image = pygame.transform.rotate(self.original_image, self.fall_angle * self.fall_direction)
+                self.image = rotated_surface(self.original_image, self.fall_angle, self.fall_direction)
                 self.rect = self.image.get_rect(center=self.rect.center)
                 
                 # Move the building down and sideways
@@ -942,382 +1228,1176 @@ class Building(pygame.sprite.Sprite):
             
             # Add debris particles
             if self.destruction_timer % 2 == 0:
-                for _ in range(5):
-                    debris = Debris(
-                        random.randint(self.rect.left, self.rect.right),
-                        random.randint(self.rect.top, self.rect.bottom),
-                        (100, 100, 100)  # Gray debris
-                    )
-                    all_sprites.add(debris)
+                self.sim.particles.emit(self.rect, (100, 100, 100), self.sim.debris(5))  # Gray debris
             
             # Kill the building after it falls off screen
             if self.rect.top > WINDOW_HEIGHT + 100:
-                self.kill()
+                self.retire()
 
-# Modify the Debris class for better explosion effects
-class Debris(pygame.sprite.Sprite):
-    def __init__(self, x, y, color):
-        super().__init__()
-        # Random size for debris
-        size = random.randint(3, 6)
-        self.image = pygame.Surface((size, size))
-        self.image.fill(color)
-        self.rect = self.image.get_rect()
-        self.rect.centerx = x
-        self.rect.centery = y
-        # More varied speeds for better explosion effect
-        self.speed_x = random.randint(-8, 8)
-        self.speed_y = random.randint(-8, 8)
-        self.gravity = 0.2
-        self.life = random.randint(45, 75)  # Varied lifetime
-        self.velocity_y = 0
-        self.rotation = random.randint(0, 360)
-        self.rotation_speed = random.randint(-5, 5)
-        self.alpha = 255  # Add alpha for fade effect
+    def destroy(self):
+        super().destroy()
+        self.sim.building_index.invalidate()
 
-    def update(self):
-        self.rect.x += self.speed_x
-        self.velocity_y += self.gravity
-        self.rect.y += self.velocity_y
-        self.rotation += self.rotation_speed
-        self.life -= 1
+# Debris particles stored as parallel NumPy arrays instead of one sprite each.
+# Dead slots are recycled and emits beyond capacity are dropped.
+class ParticleSystem:
+    def __init__(self, rng, capacity=4096, gravity=0.2, fade_frames=20):
+        self.capacity = capacity
+        self.gravity = gravity
+        self.fade_frames = fade_frames  # Start fading in the last frames of life
+        self.x = numpy.zeros(capacity)
+        self.y = numpy.zeros(capacity)
+        self.velocity_x = numpy.zeros(capacity)
+        self.velocity_y = numpy.zeros(capacity)
+        self.life = numpy.zeros(capacity, dtype=numpy.int32)
+        self.size = numpy.zeros(capacity, dtype=numpy.int32)
+        self.color = numpy.zeros(capacity, dtype=numpy.int32)  # Index into self.palette
+        self.alive = numpy.zeros(capacity, dtype=bool)
+        self.palette = []
+        self.palette_index = {}
+        self.surfaces = {}  # (color index, size, alpha) -> Surface
+        self.rng = rng
+        self.dropped = 0
+
+    def __len__(self):
+        return int(numpy.count_nonzero(self.alive))
+
+    def clear(self):
+        self.alive[:] = False
+
+    def emit(self, rect, color, count):
+        slots = numpy.flatnonzero(~self.alive)[:count]
+        self.dropped += count - len(slots)
+        n = len(slots)
+        if n == 0:
+            return
         
+        if color not in self.palette_index:
+            self.palette_index[color] = len(self.palette)
+            self.palette.append(color)
+        
+        # Random spawn point inside rect and sideways speed, drawn for the whole batch at once
+        self.x[slots] = self.rng.integers(rect.left, rect.right + 1, n)
+        self.y[slots] = self.rng.integers(rect.top, rect.bottom + 1, n)
+        self.velocity_x[slots] = self.rng.integers(-8, 9, n)
+        self.velocity_y[slots] = 0
+        self.life[slots] = self.rng.integers(45, 76, n)  # Varied lifetime
+        self.size[slots] = self.rng.integers(3, 7, n)  # Random size for debris
+        self.color[slots] = self.palette_index[color]
+        self.alive[slots] = True
+
+    def update(self):
+        alive = self.alive
+        self.x[alive] += self.velocity_x[alive]
+        self.velocity_y[alive] += self.gravity
+        self.y[alive] += self.velocity_y[alive]
+        self.life[alive] -= 1
+        alive &= self.life > 0
+
+    def alpha(self, life):
         # Fade out effect
-        if self.life < 20:  # Start fading in last 20 frames
-            self.alpha = int((self.life / 20) * 255)
-            self.image.set_alpha(self.alpha)
-            
-        if self.life <= 0:
-            self.kill()
+        return life * 255 // self.fade_frames if life < self.fade_frames else 255
 
-# Create sprite groups
-all_sprites = pygame.sprite.Group()
-aliens = pygame.sprite.Group()
-power_ups = pygame.sprite.Group()
-lasers = pygame.sprite.Group()
-buildings = pygame.sprite.Group()
-player = Player()  # Create player but don't add to all_sprites yet
-boss = None  # Will be set when boss appears
-
-# Create initial buildings
-for i in range(5):
-    building = Building(100 + i*150, WINDOW_HEIGHT - 20)
-    all_sprites.add(building)
-    buildings.add(building)
-
-# Add player last so it's drawn on top
-all_sprites.add(player)
-
-# Game variables
-clock = pygame.time.Clock()
-spawn_timer = 0
-power_up_timer = 0
-running = True
-game_over = False
-level_complete = False
-level_complete_timer = 0
-
-def reset_game():
-    global player, aliens, power_ups, lasers, all_sprites, spawn_timer, power_up_timer, level_complete, boss, buildings
-    # Clear all sprite groups
-    aliens.empty()
-    power_ups.empty()
-    lasers.empty()
-    buildings.empty()
-    all_sprites.empty()
-    
-    # Reset player and boss
-    player = Player()
-    player.health = 100
-    player.last_health = 100
-    boss = None
-    
-    # Create new buildings
-    for i in range(5):
-        building = Building(100 + i*150, WINDOW_HEIGHT - 20)
-        all_sprites.add(building)
-        buildings.add(building)
-    
-    # Add player last so it's drawn on top
-    all_sprites.add(player)
-    
-    # Reset timers and flags
-    spawn_timer = 0
-    power_up_timer = 0
-    level_complete = False
-
-def advance_level():
-    global player, level_complete, level_complete_timer
-    player.level += 1
-    player.aliens_defeated = 0
-    player.aliens_needed = 5 + (player.level - 1)  # More aliens needed per level
-    player.health = min(100, player.health + 20)  # Heal a bit when advancing
-    level_complete = True
-    level_complete_timer = 60  # Show level complete message for 1 second
-
-def get_alien_type(level):
-    # Define spawn chances based on level
-    if level < 3:
-        return random.choice(["basic", "ufo"])
-    elif level < 5:
-        return random.choice(["basic", "fast", "ufo"])
-    elif level < 7:
-        return random.choice(["basic", "fast", "tank", "ufo"])
-    else:
-        return random.choice(["basic", "fast", "tank", "shooter", "ufo"])
-
-# Game loop
-while running:
-    # Handle events
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.KEYDOWN:
-            if not game_over and not level_complete:
-                if event.key == pygame.K_SPACE:
-                    player.jump()
-                elif event.key == pygame.K_x:  # Shoot with X key
-                    player.shoot()
-            elif event.key == pygame.K_r:  # Reset game with R key
-                game_over = False
-                reset_game()
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            if not game_over and not level_complete:
-                if event.button == 1:  # Left click
-                    player.shoot()
+    def surface(self, color, size, life):
+        key = (color, size, min(life, self.fade_frames))
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = pygame.Surface((size, size))
+            surface.fill(self.palette[color])
+            surface.set_alpha(self.alpha(life))
+            self.surfaces[key] = surface
+        return surface
+
+    def draw(self, surface):
+        slots = numpy.flatnonzero(self.alive)
+        if len(slots) == 0:
+            return []
+        sizes = self.size[slots]
+        left = (self.x[slots] - sizes // 2).astype(numpy.int32)
+        top = (self.y[slots] - sizes // 2).astype(numpy.int32)
+        blits = [
+            (self.surface(color, size, life), (x, y))
+            for color, size, life, x, y in zip(
+                self.color[slots].tolist(), sizes.tolist(), self.life[slots].tolist(),
+                left.tolist(), top.tolist()
+            )
+        ]
+        return surface.blits(blits)
+
+# Uniform grid broadphase for collision checks. Sprites are bucketed by the
+# cells their rect overlaps, so a query only tests sprites sharing a cell.
+# The spritecollide/groupcollide methods mirror pygame.sprite's functions and
+# only report sprites still in the requested group.
+class SpatialHash:
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.order = {}  # Sprite -> insertion index, keeps results in a stable order
+
+    def rebuild(self, sprites):
+        self.cells.clear()
+        self.order.clear()
+        for sprite in sprites:
+            self.insert(sprite)
+
+    def cell_range(self, rect):
+        size = self.cell_size
+        return (range(rect.left // size, (rect.right - 1) // size + 1),
+                range(rect.top // size, (rect.bottom - 1) // size + 1))
+
+    def insert(self, sprite):
+        if sprite in self.order:
+            return
+        self.order[sprite] = len(self.order)
+        columns, rows = self.cell_range(sprite.rect)
+        for column in columns:
+            for row in rows:
+                self.cells.setdefault((column, row), []).append(sprite)
+
+    def query(self, sprite, group, collided=None):
+        candidates = set()
+        columns, rows = self.cell_range(sprite.rect)
+        for column in columns:
+            for row in rows:
+                bucket = self.cells.get((column, row))
+                if bucket:
+                    candidates.update(bucket)
+        
+        hits = []
+        for other in candidates:
+            if other is sprite or other not in group:
+                continue
+            if collided(sprite, other) if collided else sprite.rect.colliderect(other.rect):
+                hits.append(other)
+        hits.sort(key=self.order.__getitem__)
+        return hits
+
+    def spritecollide(self, sprite, group, dokill, collided=None):
+        hits = self.query(sprite, group, collided)
+        if dokill:
+            for hit in hits:
+                hit.kill()
+        return hits
+
+    def groupcollide(self, group_a, group_b, dokill_a, dokill_b, collided=None):
+        collisions = {}
+        for sprite in list(group_a):
+            hits = self.spritecollide(sprite, group_b, dokill_b, collided)
+            if hits:
+                collisions[sprite] = hits
+                if dokill_a:
+                    sprite.kill()
+        return collisions
+
+# Projectile pools
+laser_pool = Pool(Laser)
+energy_ball_pool = Pool(EnergyBall)
+
+# Wave definitions and entity budgets, loaded once from data/waves.json.
+# Each wave lists the alien types that can spawn from its first level on.
+Wave = namedtuple('Wave', ['first_level', 'types'])
+WaveTable = namedtuple('WaveTable', ['budgets', 'spawn_delay', 'schedule_length',
+                                     'power_up_interval', 'waves'])
+
+def load_waves(path=os.path.join(DATA_DIR, 'waves.json')):
+    with open(path, encoding='utf-8') as file:
+        table = json.load(file)
+    waves = [Wave(wave['first_level'], tuple(wave['types'])) for wave in table['waves']]
+    return WaveTable(
+        budgets=table['budgets'],
+        spawn_delay=table['spawn_delay'],
+        schedule_length=table['schedule_length'],
+        power_up_interval=table['power_up_interval'],
+        waves=sorted(waves),
+    )
+
+WAVES = load_waves()
+
+# Decides what spawns and when. At the start of each level it draws that
+# level's alien types up front into a schedule, then pops one every
+# spawn_delay ticks. Aliens are held back while the level is at its alien
+# budget or the boss is out.
+class SpawnDirector:
+    def __init__(self, sim, table=WAVES):
+        self.sim = sim
+        self.table = table
+        self.budgets = table.budgets
+        self.schedule = deque()
+        self.spawn_timer = 0
+        self.power_up_timer = 0
+        self.held_back = 0  # Ticks an alien was due but over budget
+
+    def reset(self):
+        self.spawn_timer = 0
+        self.power_up_timer = 0
+        self.start_level(1)
+
+    def wave(self, level):
+        # The last wave that has started by this level
+        current = self.table.waves[0]
+        for wave in self.table.waves:
+            if wave.first_level <= level:
+                current = wave
+        return current
+
+    def start_level(self, level):
+        delay = self.table.spawn_delay
+        self.level = level
+        self.spawn_delay = max(delay['minimum'], delay['start'] + delay['per_level'] * level)
+        self.types = self.wave(level).types
+        self.schedule.clear()
+        self.extend_schedule()
+
+    def extend_schedule(self):
+        # Long levels can outlast the schedule, so it is topped up in batches
+        rng = self.sim.random.get("spawn")
+        self.schedule.extend(rng.choice(self.types) for _ in range(self.table.schedule_length))
 
-    if not game_over and not level_complete:
-        # Update
-        all_sprites.update()
+    def update(self):
+        sim = self.sim
+        player = sim.player
         
         # Spawn boss when close to completing level
-        if player.aliens_defeated >= player.aliens_needed - 1 and boss is None:
-            boss = BossAlien(player.level)
-            all_sprites.add(boss)
+        if player.aliens_defeated >= player.aliens_needed - 1 and sim.boss is None:
+            sim.boss = sim.lifecycle.spawn(BossAlien(sim, player.level), sim.all_sprites, sim.actors)
         
         # Spawn regular aliens (faster spawn rate with higher levels)
-        spawn_timer += 1
-        spawn_delay = max(20, 60 - (player.level * 3))  # Faster spawns per level
-        if spawn_timer >= spawn_delay and boss is None:  # Don't spawn regular aliens during boss fight
-            alien_type = get_alien_type(player.level)
-            if alien_type == "ufo":
-                new_alien = UFO(player.level)
+        self.spawn_timer += 1
+        if self.spawn_timer >= self.spawn_delay and sim.boss is None:  # Don't spawn regular aliens during boss fight
+            if len(sim.aliens) >= self.budgets['aliens']:
+                self.held_back += 1
             else:
-                new_alien = Alien(player.level, alien_type)
-            all_sprites.add(new_alien)
-            aliens.add(new_alien)
-            spawn_timer = 0
+                if not self.schedule:
+                    self.extend_schedule()
+                alien_type = self.schedule.popleft()
+                if alien_type == "ufo":
+                    new_alien = UFO(sim, player.level)
+                else:
+                    new_alien = Alien(sim, player.level, alien_type)
+                sim.lifecycle.spawn(new_alien, sim.all_sprites, sim.aliens, sim.actors)
+                self.spawn_timer = 0
         
         # Spawn power-ups
-        power_up_timer += 1
-        if power_up_timer >= 300:  # Every 5 seconds
-            new_power_up = PowerUp()
-            all_sprites.add(new_power_up)
-            power_ups.add(new_power_up)
-            power_up_timer = 0
+        self.power_up_timer += 1
+        if self.power_up_timer >= self.table.power_up_interval:
+            new_power_up = PowerUp(sim)
+            sim.all_sprites.add(new_power_up)
+            sim.power_ups.add(new_power_up)
+            sim.actors.add(new_power_up)
+            self.power_up_timer = 0
+
+# Every random draw in the simulation comes from a named stream derived from
+# one seed, so a session can be reproduced exactly and a change in one
+# subsystem's draws doesn't shift the others
+class RandomStreams:
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.randrange(2**32)
+        self.seed = seed
+        self.streams = {}
+        self.array_streams = {}
+
+    def get(self, name):
+        stream = self.streams.get(name)
+        if stream is None:
+            stream = random.Random(f"{self.seed}:{name}")
+            self.streams[name] = stream
+        return stream
+
+    def get_array(self, name):
+        # NumPy generator for vectorized subsystems such as particles
+        stream = self.array_streams.get(name)
+        if stream is None:
+            stream = numpy.random.default_rng([self.seed, zlib.crc32(name.encode())])
+            self.array_streams[name] = stream
+        return stream
+
+SEED_LIMIT = 2**64  # NumPy wants a non-negative seed and recordings store it in 64 bits
+
+def seed_value(text):
+    # argparse type for --seed
+    seed = int(text)
+    if not 0 <= seed < SEED_LIMIT:
+        raise argparse.ArgumentTypeError(f'seed must be between 0 and {SEED_LIMIT - 1}')
+    return seed
+
+# Player input for one tick. jump, shoot and restart are presses that happened
+# since the previous tick; left, right and aim describe the current state.
+Inputs = namedtuple('Inputs', ['left', 'right', 'jump', 'shoot', 'restart', 'aim'],
+                    defaults=[False, False, False, False, False, (0, 0)])
+NO_INPUT = Inputs()
+
+# Per-phase frame timings in milliseconds plus entity counts. Timings are
+# kept for a rolling window, used for the overlay's percentiles, and, when
+# history_size is set, a longer history for export. Measured code calls now()
+# before a phase and mark() after it. A phase marked several times in one
+# frame is summed.
+class FrameProfiler:
+    def __init__(self, window=300, history_size=0):
+        self.window = window
+        self.phases = OrderedDict()  # Phase -> deque of recent timings
+        self.history = deque(maxlen=history_size) if history_size else None  # One row per finished frame
+        self.timings = {}
+        self.counts = {}
+        self.frames = 0
+        self.last_frame_end = time.perf_counter()
+
+    def now(self):
+        return time.perf_counter()
+
+    def resume(self):
+        # Called when measuring starts again after a pause, so the gap isn't
+        # recorded as one very long frame
+        self.timings = {}
+        self.last_frame_end = time.perf_counter()
+
+    def mark(self, phase, start):
+        now = time.perf_counter()
+        self.timings[phase] = self.timings.get(phase, 0) + (now - start) * 1000
+        return now
+
+    def count(self, sim, extra=None):
+        counts = {
+            'all_sprites': len(sim.all_sprites),
+            'aliens': len(sim.aliens),
+            'lasers': len(sim.lasers),
+            'hostile_projectiles': len(sim.hostile_projectiles),
+            'buildings': len(sim.buildings),
+            'power_ups': len(sim.power_ups),
+            'particles': len(sim.particles),
+            'particles_dropped': sim.particles.dropped,
+            'aliens_held_back': sim.director.held_back,
+            'projectiles_refused': sim.projectiles_refused,
+        }
+        for kind, states in sim.lifecycle.counts().items():
+            for state, count in states.items():
+                counts[f'{kind.lower()}_{state}'] = count
+        for name, pool in (('laser_pool', laser_pool), ('energy_ball_pool', energy_ball_pool)):
+            for stat, value in pool.stats().items():
+                counts[f'{name}_{stat}'] = value
+        if extra:
+            counts.update(extra)
+        self.counts = counts
+
+    def end_frame(self):
+        now = time.perf_counter()
+        timings = self.timings
+        timings['work'] = sum(timings.values())  # Everything measured
+        timings['frame_time'] = (now - self.last_frame_end) * 1000  # Wall time, including the frame cap
+        self.last_frame_end = now
+        
+        for phase, ms in timings.items():
+            samples = self.phases.get(phase)
+            if samples is None:
+                samples = self.phases[phase] = deque(maxlen=self.window)
+            samples.append(ms)
+        
+        if self.history is not None:
+            row = {'frame': self.frames}
+            row.update(timings)
+            row.update(self.counts)
+            self.history.append(row)
+        self.frames += 1
+        self.timings = {}
+
+    def percentiles(self, phase):
+        return numpy.percentile(self.phases[phase], (50, 95, 99))
+
+    def export(self, path):
+        # JSON for a .json path, CSV otherwise
+        rows = list(self.history)
+        with open(path, 'w', newline='') as file:
+            if path.endswith('.json'):
+                json.dump(rows, file)
+                return
+            columns = list(OrderedDict.fromkeys(key for row in rows for key in row))
+            writer = csv.DictWriter(file, columns)
+            writer.writeheader()
+            writer.writerows(rows)
+
+# Picks the quality tier from measured frame work time (excluding the frame
+# cap's sleep). It drops a tier when the rolling average runs over budget and
+# climbs back once frames have stayed well under it. After every change it
+# waits a full window before judging again, which stops it flip-flopping.
+class QualityGovernor:
+    def __init__(self, budget_ms=STEP_MS, window=60, downgrade_at=1.0, upgrade_at=0.6):
+        self.budget_ms = budget_ms
+        self.samples = deque(maxlen=window)
+        self.downgrade_at = downgrade_at
+        self.upgrade_at = upgrade_at
+        self.level = 0  # Index into QUALITY_TIERS
+        self.changes = 0
+
+    @property
+    def tier(self):
+        return QUALITY_TIERS[self.level]
+
+    def update(self, frame_ms):
+        samples = self.samples
+        samples.append(frame_ms)
+        if len(samples) < samples.maxlen:
+            return self.tier
+        average = sum(samples) / len(samples)
+        if average > self.budget_ms * self.downgrade_at and self.level < len(QUALITY_TIERS) - 1:
+            self.level += 1
+        elif average < self.budget_ms * self.upgrade_at and self.level > 0:
+            self.level -= 1
+        else:
+            return self.tier
+        samples.clear()
+        self.changes += 1
+        return self.tier
+
+# Stand-in used when nothing is being measured, so the simulation and
+# renderer can call the profiler unconditionally
+class NullProfiler:
+    def now(self):
+        return 0
+
+    def mark(self, phase, start):
+        return 0
+
+    def count(self, sim, extra=None):
+        pass
+
+    def end_frame(self):
+        pass
+
+NULL_PROFILER = NullProfiler()
+
+# Running totals for the current session, used by batch.py for balancing
+class SessionStats:
+    def __init__(self):
+        self.kills = 0
+        self.boss_kills = 0
+        self.damage_taken = 0
+        self.kill_ticks = []  # Ticks from spawn to kill, per alien
+        self.boss_kill_ticks = []
+
+class Simulation:
+    # The complete game state, advanced one fixed tick at a time by step().
+    # It never touches the display, the mixer or the wall clock: time is
+    # counted in ticks and sounds are queued by name in self.sounds.
+    # The same seed and inputs always produce the same session.
+    def __init__(self, seed=None):
+        self.random = RandomStreams(seed)
+        self.tick = 0
+        self.inputs = NO_INPUT
+        self.sounds = []
+        
+        # Create sprite groups
+        self.all_sprites = pygame.sprite.Group()
+        self.aliens = pygame.sprite.Group()
+        self.power_ups = pygame.sprite.Group()
+        self.lasers = pygame.sprite.Group()
+        self.hostile_projectiles = pygame.sprite.Group()
+        self.buildings = pygame.sprite.Group()
+        self.building_index = BuildingIndex(self.buildings)
+        self.ufo_shots = []  # UFOs that fire this tick, aimed together in fire_ufo_shots()
+        self.actors = pygame.sprite.Group()  # Aliens, the boss and power-ups, drawn under the player
+        self.particles = ParticleSystem(self.random.get_array("particles"),
+                                        capacity=WAVES.budgets['particles'])
+        self.director = SpawnDirector(self)
+        self.projectiles_refused = 0  # Hostile shots over budget
+        self.lifecycle = LifecycleManager()
+        self.collision_grid = SpatialHash()
+        self.profiler = NULL_PROFILER
+        self.quality = QUALITY_TIERS[0]  # Only main()'s governor lowers it
+        
+        self.game_over = False
+        self.level_complete_timer = 0
+        self.reset()
+
+    @property
+    def time_ms(self):
+        return self.tick * STEP_MS
+
+    def reset(self):
+        # Clear all sprite groups
+        self.aliens.empty()
+        self.power_ups.empty()
+        self.lasers.empty()
+        self.hostile_projectiles.empty()
+        self.buildings.empty()
+        self.actors.empty()
+        self.all_sprites.empty()
+        self.particles.clear()
+        self.lifecycle.clear()
+        
+        self.stats = SessionStats()
+        
+        # Reset player and boss
+        self.player = Player(self)
+        self.boss = None  # Will be set when boss appears
+        
+        # Create new buildings
+        for i in range(5):
+            building = Building(self, 100 + i*150, WINDOW_HEIGHT - 20)
+            self.lifecycle.spawn(building, self.all_sprites, self.buildings)
+        self.building_index.invalidate()
+        
+        # Draw order is decided by the renderer's layers, not by all_sprites.
+        # The player is still added last to keep the update order unchanged.
+        self.all_sprites.add(self.player)
+        
+        # Reset timers and flags
+        self.director.reset()
+        self.level_complete = False
+
+    def advance_level(self):
+        player = self.player
+        player.level += 1
+        player.aliens_defeated = 0
+        player.aliens_needed = 5 + (player.level - 1)  # More aliens needed per level
+        player.health = min(100, player.health + 20)  # Heal a bit when advancing
+        self.level_complete = True
+        self.level_complete_timer = 60  # Show level complete message for 1 second
+        self.director.start_level(player.level)
+
+    def play(self, name):
+        self.sounds.append(name)
+
+    def hurt_player(self, damage):
+        # Power-ups make the player invulnerable
+        if self.player.power_up:
+            return
+        self.player.health -= damage
+        self.stats.damage_taken += damage
+        if self.player.health <= 0:
+            self.game_over = True
+
+    def debris(self, count):
+        # Debris particles for an explosion at the current quality tier
+        return max(1, round(count * self.quality.debris_scale))
+
+    def add_player_laser(self, laser):
+        self.all_sprites.add(laser)
+        self.lasers.add(laser)
+
+    # Enemy lasers and energy balls all live in hostile_projectiles, tagged with
+    # the entity that fired them and the damage they deal, so hit checks are one
+    # query per frame and keep working after the shooter is gone. Shots beyond
+    # the hostile projectile budget go straight back to their pool.
+    def fire_hostile(self, projectile, owner, player_damage, building_damage=0):
+        if len(self.hostile_projectiles) >= self.director.budgets['hostile_projectiles']:
+            projectile.kill()
+            self.projectiles_refused += 1
+            return False
+        projectile.owner = owner
+        projectile.player_damage = player_damage
+        projectile.building_damage = building_damage
+        self.all_sprites.add(projectile)
+        self.hostile_projectiles.add(projectile)
+        return True
+
+    def step(self, inputs=NO_INPUT):
+        self.inputs = inputs
+        self.sounds = []
+        
+        # Handle presses
+        if not self.game_over and not self.level_complete:
+            if inputs.jump:
+                self.player.jump()
+            if inputs.shoot:
+                self.player.shoot()
+        elif inputs.restart:
+            self.game_over = False
+            self.reset()
+        
+        if not self.game_over and not self.level_complete:
+            # Update
+            profiler = self.profiler
+            start = profiler.now()
+            self.all_sprites.update()
+            self.fire_ufo_shots()
+            start = profiler.mark('update', start)
+            self.particles.update()
+            start = profiler.mark('update_particles', start)
+            self.lifecycle.update()
+            start = profiler.mark('update_lifecycle', start)
+            self.director.update()
+            profiler.mark('spawn', start)
+            self.check_collisions()
+            self.player.last_health = self.player.health
+        
+        elif self.level_complete:
+            self.level_complete_timer -= 1
+            if self.level_complete_timer <= 0:
+                self.level_complete = False
+        
+        self.tick += 1
+
+    def fire_ufo_shots(self):
+        # Aim every UFO that fired this tick with a single distance query
+        shooters = self.ufo_shots
+        if not shooters:
+            return
+        targets = self.building_index.closest([ufo.rect.center for ufo in shooters])
+        for ufo, building in zip(shooters, targets):
+            if building is not None:
+                ufo.fire_at(building)
+        shooters.clear()
+
+    def check_collisions(self):
+        player = self.player
+        grid = self.collision_grid
+        profiler = self.profiler
+        start = profiler.now()
+        
+        # Index everything once, every collision check below goes through the grid
+        grid.rebuild(self.all_sprites)
+        start = profiler.mark('collide_grid', start)
         
         # Check laser collisions with aliens and boss
-        laser_hits = pygame.sprite.groupcollide(lasers, aliens, True, False)
+        laser_hits = grid.groupcollide(self.lasers, self.aliens, True, False, collide_living)
         for laser, alien_list in laser_hits.items():
             for alien in alien_list:
                 total_damage = player.damage + player.damage_boost
                 alien.health -= total_damage
                 if alien.health <= 0:
-                    alien.destroyed = True  # Set destroyed flag instead of killing immediately
+                    alien.destroy()  # Play the destruction effect instead of killing immediately
+                    self.stats.kills += 1
+                    self.stats.kill_ticks.append(self.tick - alien.spawn_tick)
                     player.score += 1
                     player.aliens_defeated += 1
-                    power_up_sound.play()
+                    self.play('power_up')
                     # Create explosion effect with more debris
-                    for _ in range(20):  # Increased number of debris particles
-                        debris = Debris(
-                            random.randint(alien.rect.left, alien.rect.right),
-                            random.randint(alien.rect.top, alien.rect.bottom),
-                            alien.color
-                        )
-                        all_sprites.add(debris)
+                    self.particles.emit(alien.rect, alien.color, self.debris(20))  # Increased number of debris particles
+        start = profiler.mark('collide_lasers', start)
         
         # Check laser collisions with boss
+        boss = self.boss
         if boss and boss.health > 0:  # Add check for boss existence and health
-            laser_hits = pygame.sprite.spritecollide(boss, lasers, True)
+            laser_hits = grid.spritecollide(boss, self.lasers, True)
             for laser in laser_hits:
                 total_damage = player.damage + player.damage_boost
                 boss.health -= total_damage
                 if boss.health <= 0:
-                    boss.kill()
-                    boss = None
+                    boss.destroy()
+                    self.boss = None
+                    self.stats.boss_kills += 1
+                    self.stats.boss_kill_ticks.append(self.tick - boss.spawn_tick)
                     player.score += 5  # Bonus points for defeating boss
                     player.aliens_defeated += 1
-                    power_up_sound.play()
-                    advance_level()
+                    self.play('power_up')
+                    self.advance_level()
+                    break  # Remaining lasers in this volley have nothing left to hit
         
-        # Check energy ball collisions with player
-        if boss:
-            energy_hits = pygame.sprite.spritecollide(player, boss.energy_balls, True)
-            for hit in energy_hits:
-                if not player.power_up:
-                    player.health -= 5  # Reduced from 15 to 5
-                    if player.health <= 0:
-                        game_over = True
-            
-            # Check direct collision with boss
-            if pygame.sprite.collide_rect(player, boss):
-                if not player.power_up:
-                    player.health -= 8  # Reduced from 20 to 8
-                    if player.health <= 0:
-                        game_over = True
+        # Check direct collision with boss
+        if self.boss:
+            if pygame.sprite.collide_rect(player, self.boss):
+                self.hurt_player(8)  # Reduced from 20 to 8
+        start = profiler.mark('collide_boss', start)
         
         # Check power-up collisions
-        power_hits = pygame.sprite.spritecollide(player, power_ups, True)
+        power_hits = grid.spritecollide(player, self.power_ups, True)
         for hit in power_hits:
             hit.apply_power_up(player)
-            power_up_sound.play()
+            self.play('power_up')
+        start = profiler.mark('collide_power_ups', start)
         
-        # Check alien laser collisions with player
-        for alien in aliens:
-            laser_hits = pygame.sprite.spritecollide(player, alien.lasers, True)
-            for hit in laser_hits:
-                if not player.power_up:
-                    player.health -= 2  # Reduced from 5 to 2
-                    if player.health <= 0:
-                        game_over = True
+        # Check alien lasers and boss energy balls against the player
+        hostile_hits = grid.spritecollide(player, self.hostile_projectiles, True)
+        for hit in hostile_hits:
+            self.hurt_player(hit.player_damage)
+        start = profiler.mark('collide_hostile', start)
         
         # Check direct collisions between player and aliens
-        alien_collisions = pygame.sprite.spritecollide(player, aliens, False)
+        alien_collisions = grid.spritecollide(player, self.aliens, False)
         for alien in alien_collisions:
-            if not player.power_up:
-                # Reduced damage from tripod collisions
-                player.health -= 1  # Reduced from 2 to 1
-                if player.health <= 0:
-                    game_over = True
+            # Reduced damage from tripod collisions
+            self.hurt_player(1)  # Reduced from 2 to 1
+        start = profiler.mark('collide_aliens', start)
         
         # Check UFO laser collisions with buildings
-        for ufo in aliens:
-            if isinstance(ufo, UFO):
-                laser_hits = pygame.sprite.groupcollide(ufo.lasers, buildings, True, False)
-                for laser, building_list in laser_hits.items():
-                    for building in building_list:
-                        if not building.destroyed:
-                            building.health -= 10
-                            building.on_fire = True
-                            if building.health <= 0:
-                                building.destroyed = True
-                                building.image.fill((50, 50, 50))
-                                player.score += 5
-                                # Create initial explosion effect
-                                for _ in range(20):
-                                    debris = Debris(
-                                        random.randint(building.rect.left, building.rect.right),
-                                        random.randint(building.rect.top, building.rect.bottom),
-                                        (100, 100, 100)
-                                    )
-                                    all_sprites.add(debris)
-                                # Make building start falling immediately
-                                building.fall_angle = 0
-                                building.fall_speed = 0
-                                building.fall_direction = random.choice([-1, 1])
-        
-        player.last_health = player.health
-    
-    elif level_complete:
-        level_complete_timer -= 1
-        if level_complete_timer <= 0:
-            level_complete = False
-    
-    # Draw everything
-    screen.fill(SKY_BLUE)
-    pygame.draw.rect(screen, GREEN, (0, WINDOW_HEIGHT - 20, WINDOW_WIDTH, 20))
-    all_sprites.draw(screen)
-    
-    # Draw health bar
-    pygame.draw.rect(screen, RED, (10, 10, 100, 20))
-    pygame.draw.rect(screen, GREEN, (10, 10, player.health, 20))
-    
-    # Draw boss health if boss exists
-    if boss:
-        boss_health_width = (boss.health / (10 + (player.level * 5))) * 200
-        pygame.draw.rect(screen, RED, (WINDOW_WIDTH//2 - 100, 10, 200, 20))
-        pygame.draw.rect(screen, (255, 0, 255), (WINDOW_WIDTH//2 - 100, 10, boss_health_width, 20))
-        boss_text = font.render('BOSS', True, WHITE)
-        screen.blit(boss_text, (WINDOW_WIDTH//2 - 30, 15))
+        building_threats = [p for p in self.hostile_projectiles if p.building_damage]
+        laser_hits = grid.groupcollide(building_threats, self.buildings, True, False)
+        for laser, building_list in laser_hits.items():
+            for building in building_list:
+                if not building.destroyed:
+                    building.health -= laser.building_damage
+                    building.on_fire = True
+                    if building.health <= 0:
+                        building.destroy()
+                        building.image = charred_building
+                        player.score += 5
+                        # Create initial explosion effect
+                        self.particles.emit(building.rect, (100, 100, 100), self.debris(20))
+                        # Make building start falling immediately
+                        building.fall_angle = 0
+                        building.fall_speed = 0
+                        building.fall_direction = building.rng.choice([-1, 1])
+        profiler.mark('collide_buildings', start)
+
+    def state_digest(self):
+        # Fingerprint of the visible game state, used to check that a replay
+        # reproduced its recording exactly
+        digest = hashlib.sha1()
+        player = self.player
+        digest.update(repr((self.tick, player.score, player.level, player.health,
+                            tuple(player.rect), self.game_over, self.level_complete)).encode())
+        for sprite in self.all_sprites:
+            digest.update(repr((type(sprite).__name__, tuple(sprite.rect))).encode())
+        alive = self.particles.alive
+        digest.update(self.particles.x[alive].tobytes())
+        digest.update(self.particles.y[alive].tobytes())
+        return digest.hexdigest()
+
+# Input recordings: a header with the seed and tick count, one packed record
+# per tick, then the state digest at the end of the session
+RECORDING_MAGIC = b'WOTW'
+RECORDING_VERSION = 1
+RECORDING_HEADER = struct.Struct('<4sHQI')  # Magic, version, seed, tick count
+RECORDING_TICK = struct.Struct('<Bhh')  # Input flags, aim x, aim y
+RECORDING_DIGEST_SIZE = 40  # Hex SHA-1
+INPUT_FLAGS = ('left', 'right', 'jump', 'shoot', 'restart')
+
+Recording = namedtuple('Recording', ['seed', 'inputs', 'digest'])
+
+class InputRecorder:
+    def __init__(self, path, seed):
+        self.file = open(path, 'wb')
+        self.seed = seed
+        self.ticks = 0
+        self.file.write(RECORDING_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, seed, 0))
+
+    def record(self, inputs):
+        flags = 0
+        for bit, name in enumerate(INPUT_FLAGS):
+            if getattr(inputs, name):
+                flags |= 1 << bit
+        self.file.write(RECORDING_TICK.pack(flags, *inputs.aim))
+        self.ticks += 1
+
+    def close(self, sim):
+        self.file.write(sim.state_digest().encode('ascii'))
+        # Go back and fill in the tick count now that it is known
+        self.file.seek(0)
+        self.file.write(RECORDING_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, self.seed, self.ticks))
+        self.file.close()
+
+def load_recording(path):
+    with open(path, 'rb') as recording_file:
+        data = recording_file.read()
+    magic, version, seed, ticks = RECORDING_HEADER.unpack_from(data)
+    if magic != RECORDING_MAGIC or version != RECORDING_VERSION:
+        raise ValueError(f'{path} is not a version {RECORDING_VERSION} input recording')
     
-    # Draw score and level info
-    font = pygame.font.Font(None, 36)
-    score_text = font.render(f'Score: {player.score}', True, BLACK)
-    screen.blit(score_text, (WINDOW_WIDTH - 120, 10))
+    inputs = []
+    offset = RECORDING_HEADER.size
+    for _ in range(ticks):
+        flags, aim_x, aim_y = RECORDING_TICK.unpack_from(data, offset)
+        offset += RECORDING_TICK.size
+        pressed = [bool(flags & (1 << bit)) for bit in range(len(INPUT_FLAGS))]
+        inputs.append(Inputs(*pressed, aim=(aim_x, aim_y)))
+    digest = data[offset:offset + RECORDING_DIGEST_SIZE].decode('ascii') or None
+    return Recording(seed, inputs, digest)
+
+# Fonts are loaded once per size and rendered text is kept in a bounded cache
+# keyed by (text, colour, size)
+class TextCache:
+    def __init__(self, max_entries=256):
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.max_entries = max_entries
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = pygame.font.Font(None, size)
+            self.fonts[size] = font
+        return font
+
+    def render(self, text, color, size=36):
+        key = (text, color, size)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.font(size).render(text, True, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.max_entries:
+                self.surfaces.popitem(last=False)  # Drop least recently used text
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+# A line of HUD text bound to one or more values. It only looks up a new
+# surface when the values (or colour) differ from the previous frame.
+class HudText:
+    def __init__(self, text_cache, template, color, position, size=36, centered=False):
+        self.text_cache = text_cache
+        self.template = template
+        self.color = color
+        self.position = position
+        self.size = size
+        self.centered = centered  # Center horizontally on position[0]
+        self.values = None
+        self.surface = None
+
+    def draw(self, screen, *values, color=None):
+        color = color or self.color
+        if self.surface is None or (values, color) != self.values:
+            self.values = (values, color)
+            text = self.template.format(*values)
+            self.surface = self.text_cache.render(text, color, self.size)
+        if self.centered:
+            rect = self.surface.get_rect(midtop=self.position)
+        else:
+            rect = self.surface.get_rect(topleft=self.position)
+        return screen.blit(self.surface, rect)
+
+# "full" repaints and flips the whole window every frame. "dirty" restores
+# last frame's sprite and HUD rects from a pre-rendered background and only
+# pushes the changed regions to the display.
+RENDER_MODES = ('full', 'dirty')
+
+class Renderer:
+    # Draws a Simulation's current state onto a surface
+    def __init__(self, screen, mode='full', profiler=NULL_PROFILER):
+        self.screen = screen
+        self.mode = mode
+        self.profiler = profiler
+        self.show_profiler = False  # Toggled with F3
+        self.profiler_image = None
+        self.dirty = []  # Rects drawn this frame
+        self.previous = []  # Rects drawn last frame, erased before drawing
+        self.full_redraw = True
+        self.overlay_shown = False
+        
+        # The sky and ground never change, so draw them once
+        self.background = pygame.Surface(screen.get_size(), 0, screen)
+        self.background.fill(SKY_BLUE)
+        pygame.draw.rect(self.background, GREEN, (0, WINDOW_HEIGHT - 20, WINDOW_WIDTH, 20))
+        self.text_cache = TextCache()
+        text = self.text_cache
+        center_x = WINDOW_WIDTH // 2
+        
+        # Create semi-transparent overlay for the level complete and game over screens
+        self.overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+        self.overlay.fill((0, 0, 0))
+        self.overlay.set_alpha(128)
+        
+        self.boss_label = HudText(text, 'BOSS', WHITE, (center_x - 30, 15))
+        self.score_text = HudText(text, 'Score: {}', BLACK, (WINDOW_WIDTH - 120, 10))
+        self.level_text = HudText(text, 'Level: {}', BLACK, (10, 40))
+        self.progress_text = HudText(text, 'Aliens: {}/{}', BLACK, (WINDOW_WIDTH - 200, 40))
+        self.power_text = HudText(text, 'POWER UP!', (255, 255, 0), (center_x - 60, 10))
+        self.damage_text = HudText(text, 'Damage: {}', (255, 0, 0), (center_x - 60, 40))
+        self.weapon_text = HudText(text, '{}: ', WHITE, (WINDOW_WIDTH - 200, 70))
+        self.ammo_text = HudText(text, '{}', WHITE, (WINDOW_WIDTH - 100, 70))
+        self.level_complete_text = HudText(text, 'LEVEL {} COMPLETE!', YELLOW,
+                                           (center_x, WINDOW_HEIGHT//2), size=74, centered=True)
+        self.game_over_text = HudText(text, 'GAME OVER', RED,
+                                      (center_x, WINDOW_HEIGHT//2 - 50), size=74, centered=True)
+        self.final_score_text = HudText(text, 'Final Score: {}', WHITE,
+                                        (center_x, WINDOW_HEIGHT//2 + 10), centered=True)
+        self.final_level_text = HudText(text, 'Level Reached: {}', WHITE,
+                                        (center_x, WINDOW_HEIGHT//2 + 50), centered=True)
+        self.restart_text = HudText(text, 'Press R to Restart', WHITE,
+                                    (center_x, WINDOW_HEIGHT//2 + 100), centered=True)
+        
+        # Render layers from bottom to top. The background layer is
+        # self.background, restored by draw() before the others. Each layer
+        # draws itself and returns the rects it touched.
+        self.layers = [
+            self.draw_buildings,
+            self.draw_actors,
+            self.draw_projectiles,
+            self.draw_particles,
+            self.draw_hud,
+        ]
+
+    def draw(self, sim):
+        screen = self.screen
+        profiler = self.profiler
+        start = profiler.now()
+        self.dirty.clear()  # In case the last frame was drawn but never presented
+        
+        # Clear the screen: all of it, or only what was drawn last frame
+        if self.mode == 'full' or self.full_redraw:
+            screen.blit(self.background, (0, 0))
+        else:
+            for rect in self.previous:
+                screen.blit(self.background, rect, rect)
+        start = profiler.mark('draw_background', start)
+        
+        for layer in self.layers:
+            self.dirty.extend(layer(sim))
+            start = profiler.mark(layer.__name__, start)
+        
+        if self.show_profiler:
+            self.dirty.append(self.draw_profiler())
+            profiler.mark('draw_profiler', start)
+
+    def draw_profiler(self):
+        # Rolling percentiles per phase and the latest entity counts. The
+        # numbers are only re-rendered twice a second so they stay readable.
+        profiler = self.profiler
+        if self.profiler_image is None or profiler.frames % 30 == 0:
+            font = self.text_cache.font(20)
+            rows = [('phase (ms)', 'p50', 'p95', 'p99')]
+            for phase in profiler.phases:
+                rows.append((phase,) + tuple(f'{ms:.2f}' for ms in profiler.percentiles(phase)))
+            counts = [f'{name} {count}' for name, count in profiler.counts.items()]
+            
+            # Timings on the left, counts in a column to their right
+            line_height = 16
+            height = max(len(rows), len(counts)) * line_height + 8
+            image = pygame.Surface((460, height), pygame.SRCALPHA)
+            image.fill((0, 0, 0, 160))
+            for line, row in enumerate(rows):
+                y = 4 + line * line_height
+                image.blit(font.render(row[0], True, WHITE), (4, y))
+                for column, text in enumerate(row[1:]):
+                    image.blit(font.render(text, True, WHITE), (140 + column * 40, y))
+            for line, text in enumerate(counts):
+                image.blit(font.render(text, True, YELLOW), (270, 4 + line * line_height))
+            self.profiler_image = image
+        return self.screen.blit(self.profiler_image, (10, 100))
+
+    def draw_buildings(self, sim):
+        return self.screen.blits([(building.image, building.rect) for building in sim.buildings])
+
+    def draw_actors(self, sim):
+        blits = [(sprite.image, sprite.rect) for sprite in sim.actors]
+        blits.append((sim.player.image, sim.player.rect))  # Player on top of the other actors
+        return self.screen.blits(blits)
+
+    def draw_projectiles(self, sim):
+        # Lasers and energy balls are plain coloured rectangles, so fill them
+        # straight onto the screen instead of blitting a surface
+        fill = self.screen.fill
+        dirty = [fill(laser.color, laser.rect) for laser in sim.lasers]
+        dirty.extend(fill(projectile.color, projectile.rect) for projectile in sim.hostile_projectiles)
+        return dirty
+
+    def draw_particles(self, sim):
+        return sim.particles.draw(self.screen)
+
+    def draw_hud(self, sim):
+        screen = self.screen
+        player = sim.player
+        boss = sim.boss
+        dirty = []
+        
+        # Draw health bar
+        dirty.append(pygame.draw.rect(screen, RED, (10, 10, 100, 20)))
+        dirty.append(pygame.draw.rect(screen, GREEN, (10, 10, player.health, 20)))
+        
+        # Draw boss health if boss exists
+        if boss:
+            boss_health_width = (boss.health / (10 + (player.level * 5))) * 200
+            dirty.append(pygame.draw.rect(screen, RED, (WINDOW_WIDTH//2 - 100, 10, 200, 20)))
+            dirty.append(pygame.draw.rect(screen, (255, 0, 255), (WINDOW_WIDTH//2 - 100, 10, boss_health_width, 20)))
+            dirty.append(self.boss_label.draw(screen))
+        
+        # Draw score and level info
+        dirty.append(self.score_text.draw(screen, player.score))
+        dirty.append(self.level_text.draw(screen, player.level))
+        
+        # Draw aliens defeated progress
+        dirty.append(self.progress_text.draw(screen, player.aliens_defeated, player.aliens_needed))
+        
+        # Draw power-up status and damage info
+        if player.power_up:
+            dirty.append(self.power_text.draw(screen))
+            dirty.append(self.damage_text.draw(screen, player.damage + player.damage_boost))
+        
+        # Draw weapon info
+        if player.current_weapon != "laser":
+            dirty.append(self.weapon_text.draw(screen, player.current_weapon.upper()))
+            
+            weapon = WEAPONS[player.current_weapon]
+            ammo = self.ammo_text.draw(screen, player.ammo[weapon.name], color=weapon.color)
+            dirty.append(ammo)
+        
+        self.draw_overlay(sim)
+        return dirty
+
+    def draw_overlay(self, sim):
+        screen = self.screen
+        player = sim.player
+        
+        # The overlays dim the whole window, so they always need a full update
+        # and the next frame has to repaint everything they covered
+        self.overlay_shown = sim.level_complete or sim.game_over
+        
+        # Draw level complete screen
+        if sim.level_complete:
+            screen.blit(self.overlay, (0, 0))
+            self.level_complete_text.draw(screen, player.level)
+        
+        # Draw game over screen
+        elif sim.game_over:
+            screen.blit(self.overlay, (0, 0))
+            self.game_over_text.draw(screen)
+            
+            # Draw final score and level
+            self.final_score_text.draw(screen, player.score)
+            self.final_level_text.draw(screen, player.level)
+            
+            # Draw restart instructions
+            self.restart_text.draw(screen)
     
-    # Draw level info
-    level_text = font.render(f'Level: {player.level}', True, BLACK)
-    screen.blit(level_text, (10, 40))
+    def present(self):
+        # Push the frame just drawn to the display
+        start = self.profiler.now()
+        if self.mode == 'full' or self.full_redraw or self.overlay_shown:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.previous + self.dirty)
+        self.full_redraw = self.overlay_shown
+        self.previous, self.dirty = self.dirty, self.previous
+        self.dirty.clear()
+        self.profiler.mark('flip', start)
+
+def run_headless(ticks, inputs=NO_INPUT, seed=None):
+    # Advance a fresh simulation with no window, audio or frame cap. The game
+    # is restarted whenever the player dies, so every tick does real work
+    # instead of idling on the game over screen.
+    sim = Simulation(seed)
+    restart = inputs._replace(restart=True)
+    games = 1
+    start = time.perf_counter()
+    for _ in range(ticks):
+        if sim.game_over:
+            sim.step(restart)
+            games += 1
+        else:
+            sim.step(inputs)
+    elapsed = time.perf_counter() - start
+    print(f'{ticks} ticks over {games} games in {elapsed:.2f}s ({ticks / elapsed:.0f} ticks/sec)')
+    return sim
+
+def run_replay(path):
+    # Re-run a recorded session headless and check it ends in the same state
+    recording = load_recording(path)
+    sim = Simulation(recording.seed)
+    start = time.perf_counter()
+    for inputs in recording.inputs:
+        sim.step(inputs)
+    elapsed = time.perf_counter() - start
+    ticks = len(recording.inputs)
+    print(f'Replayed {ticks} ticks in {elapsed:.2f}s ({ticks / max(elapsed, 1e-9):.0f} ticks/sec)')
     
-    # Draw aliens defeated progress
-    progress_text = font.render(f'Aliens: {player.aliens_defeated}/{player.aliens_needed}', True, BLACK)
-    screen.blit(progress_text, (WINDOW_WIDTH - 200, 40))
+    digest = sim.state_digest()
+    if recording.digest and digest != recording.digest:
+        print(f'Replay diverged: final state {digest}, recorded {recording.digest}')
+        return False
+    print(f'Final state {digest}')
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="War of the Worlds Adventure!")
+    parser.add_argument('--headless', type=int, metavar='TICKS',
+                        help='run TICKS simulation ticks without a window and report the tick rate')
+    parser.add_argument('--seed', type=seed_value, help='seed for every random stream in the simulation')
+    parser.add_argument('--record', metavar='PATH', help='record the seed and every tick\'s input to PATH')
+    parser.add_argument('--replay', metavar='PATH', help='replay a recording headless and verify the result')
+    parser.add_argument('--render', choices=RENDER_MODES, default='full',
+                        help='redraw the whole window each frame, or only the regions that changed')
+    parser.add_argument('--quality', choices=['auto'] + [tier.name for tier in QUALITY_TIERS], default='auto',
+                        help='effects quality, or auto to lower it when frames run long (default auto)')
+    parser.add_argument('--profile', metavar='PATH',
+                        help='write per-frame timings and entity counts to PATH on exit (.json or .csv)')
+    args = parser.parse_args()
     
-    # Draw power-up status and damage info
-    if player.power_up:
-        power_text = font.render('POWER UP!', True, (255, 255, 0))
-        screen.blit(power_text, (WINDOW_WIDTH // 2 - 60, 10))
-        damage_text = font.render(f'Damage: {player.damage + player.damage_boost}', True, (255, 0, 0))
-        screen.blit(damage_text, (WINDOW_WIDTH // 2 - 60, 40))
+    if args.replay:
+        sys.exit(0 if run_replay(args.replay) else 1)
+    if args.headless:
+        run_headless(args.headless, seed=args.seed)
+        return
     
-    # Draw weapon info
-    if player.current_weapon != "laser":
-        weapon_text = font.render(f'{player.current_weapon.upper()}: ', True, WHITE)
-        screen.blit(weapon_text, (WINDOW_WIDTH - 200, 70))
-        
-        if player.current_weapon == "rpg":
-            ammo_text = font.render(f'{player.rpg_ammo}', True, (255, 165, 0))
-        elif player.current_weapon == "assault_rifle":
-            ammo_text = font.render(f'{player.assault_rifle_ammo}', True, (128, 128, 128))
-        elif player.current_weapon == "pistol":
-            ammo_text = font.render(f'{player.pistol_ammo}', True, (192, 192, 192))
-        elif player.current_weapon == "sniper":
-            ammo_text = font.render(f'{player.sniper_ammo}', True, (0, 255, 255))
-        else:  # finger_gun
-            ammo_text = font.render(f'{player.finger_gun_ammo}', True, (255, 192, 203))
-            
-        screen.blit(ammo_text, (WINDOW_WIDTH - 100, 70))
+    pygame.init()
+    pygame.mixer.init()
+    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    pygame.display.set_caption("War of the Worlds Adventure!")
+    sound_bus = SoundBus(load_sounds())
     
-    # Draw level complete screen
-    if level_complete:
-        # Create semi-transparent overlay
-        overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
-        overlay.fill((0, 0, 0))
-        overlay.set_alpha(128)
-        screen.blit(overlay, (0, 0))
-        
-        # Draw level complete text
-        level_complete_font = pygame.font.Font(None, 74)
-        level_complete_text = level_complete_font.render(f'LEVEL {player.level} COMPLETE!', True, YELLOW)
-        screen.blit(level_complete_text, (WINDOW_WIDTH//2 - level_complete_text.get_width()//2, WINDOW_HEIGHT//2))
+    sim = Simulation(args.seed)
+    recorder = InputRecorder(args.record, sim.random.seed) if args.record else None
+    # Frames are only measured while the F3 overlay is up or an export is
+    # pending; the rest of the time the null profiler stays attached
+    frame_profiler = FrameProfiler(history_size=18000 if args.profile else 0)
+    profiler = frame_profiler if args.profile else NULL_PROFILER
+    sim.profiler = profiler
     
-    # Draw game over screen
-    elif game_over:
-        # Create semi-transparent overlay
-        overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
-        overlay.fill((0, 0, 0))
-        overlay.set_alpha(128)
-        screen.blit(overlay, (0, 0))
-        
-        # Draw game over text
-        game_over_font = pygame.font.Font(None, 74)
-        game_over_text = game_over_font.render('GAME OVER', True, RED)
-        screen.blit(game_over_text, (WINDOW_WIDTH//2 - game_over_text.get_width()//2, WINDOW_HEIGHT//2 - 50))
-        
-        # Draw final score and level
-        final_score_text = font.render(f'Final Score: {player.score}', True, WHITE)
-        screen.blit(final_score_text, (WINDOW_WIDTH//2 - final_score_text.get_width()//2, WINDOW_HEIGHT//2 + 10))
-        
-        final_level_text = font.render(f'Level Reached: {player.level}', True, WHITE)
-        screen.blit(final_level_text, (WINDOW_WIDTH//2 - final_level_text.get_width()//2, WINDOW_HEIGHT//2 + 50))
-        
-        # Draw restart instructions
-        restart_text = font.render('Press R to Restart', True, WHITE)
-        screen.blit(restart_text, (WINDOW_WIDTH//2 - restart_text.get_width()//2, WINDOW_HEIGHT//2 + 100))
+    # Debris counts depend on the tier and replays always run at full
+    # quality, so a recorded session is pinned to it
+    quality = 'high' if recorder else args.quality
+    governor = QualityGovernor() if quality == 'auto' else None
+    if not governor:
+        sim.quality = next(tier for tier in QUALITY_TIERS if tier.name == quality)
+    renderer = Renderer(screen, args.render, profiler)
+    clock = pygame.time.Clock()
+    lag = 0
+    jump = shoot = restart = False
+    running = True
     
-    pygame.display.flip()
+    # Game loop
+    while running:
+        start = profiler.now()
+        
+        # Handle events. Presses are held until a tick consumes them.
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    jump = True
+                elif event.key == pygame.K_x:  # Shoot with X key
+                    shoot = True
+                elif event.key == pygame.K_r:  # Reset game with R key
+                    restart = True
+                elif event.key == pygame.K_F3:  # Toggle the profiler overlay
+                    renderer.show_profiler = not renderer.show_profiler
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                if event.button == 1:  # Left click
+                    shoot = True
+        profiler.mark('events', start)
+        
+        wanted = frame_profiler if args.profile or renderer.show_profiler else NULL_PROFILER
+        if wanted is not profiler:
+            profiler = sim.profiler = renderer.profiler = wanted
+            frame_profiler.resume()
+        
+        # Cap the frame rate and run one tick per STEP_MS of real time. The
+        # clock counts whole milliseconds, so a frame within a millisecond
+        # of STEP_MS counts as exactly one tick. Otherwise 16 ms frames would
+        # now and then leave a frame with no tick that redraws the same state.
+        elapsed = clock.tick(60)
+        if abs(elapsed - STEP_MS) < 1:
+            elapsed = STEP_MS
+        lag += elapsed
+        if governor:
+            sim.quality = governor.update(clock.get_rawtime())
+        steps = 0
+        while lag >= STEP_MS and steps < MAX_STEPS_PER_FRAME:
+            keys = pygame.key.get_pressed()
+            inputs = Inputs(keys[pygame.K_LEFT], keys[pygame.K_RIGHT], jump, shoot, restart,
+                            pygame.mouse.get_pos())
+            sim.step(inputs)
+            if recorder:
+                recorder.record(inputs)
+            for name in sim.sounds:
+                sound_bus.play(name, sim.time_ms)
+            jump = shoot = restart = False
+            lag -= STEP_MS
+            steps += 1
+        lag = min(lag, STEP_MS)  # Forget time we could not catch up on
+        
+        renderer.draw(sim)
+        renderer.present()
+        if profiler is not NULL_PROFILER:
+            counts = {f'sound_{name}': count for name, count in sound_bus.stats().items()}
+            counts['quality_tier'] = sim.quality.name
+            profiler.count(sim, counts)
+            profiler.end_frame()
     
-    # Cap the frame rate
-    clock.tick(60)
+    if recorder:
+        recorder.close(sim)
+    if args.profile:
+        frame_profiler.export(args.profile)
+    pygame.quit()
 
-pygame.quit()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
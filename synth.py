@@ -0,0 +1,42 @@
+import numpy
+
+# Array-based building blocks for the procedural sound effects in main.py.
+# Every helper works on a whole buffer at once instead of sample by sample.
+
+SAMPLE_RATE = 44100
+
+def timeline(duration, sample_rate=SAMPLE_RATE):
+    # Sample times in seconds for a clip of the given duration
+    num_samples = int(sample_rate * duration)
+    return numpy.arange(num_samples) / sample_rate
+
+def sine(frequency, t):
+    # Frequency may be a constant or an array the same length as t
+    return numpy.sin(2 * numpy.pi * frequency * t)
+
+def wobble(center, depth, rate, t):
+    # Frequency that swings around center, e.g. 800 + sin(t * 10) * 200
+    return center + numpy.sin(t * rate) * depth
+
+def ramp(start, end, t, duration):
+    # Linear envelope from start to end over the clip
+    return start + (end - start) * (t / duration)
+
+def noise(rng, low, high, t):
+    # One uniform random value per sample
+    return rng.uniform(low, high, len(t))
+
+def random_frequencies(rng, low, high, t):
+    # One random integer frequency per sample, inclusive like random.randint
+    return rng.integers(low, high + 1, len(t))
+
+def amplitude_modulate(signal, depth, rate, t):
+    # Tremolo: scale the signal by 1 + depth * sin(2 * pi * rate * t)
+    return signal * (1 + depth * sine(rate, t))
+
+def to_stereo_pcm(signal):
+    # Convert a float signal in roughly [-1, 1] into 16-bit stereo frames.
+    # Values are truncated like int() and wrap on overflow, matching how the
+    # original per-sample lists were packed into int16 arrays.
+    mono = (32767 * signal).astype(numpy.int64).astype(numpy.int16)
+    return numpy.column_stack((mono, mono))